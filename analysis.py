@@ -0,0 +1,120 @@
+import functools
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+import helper
+import links
+import profiling
+import response_time
+import result_cache
+import rollup
+from chat_index import ChatIndex
+from response_time import ResponseTimeReport
+
+
+@dataclass
+class ChatAnalysis:
+    # everything the dashboard renders for one user (or 'Overall')
+    user: str
+    num_messages: int
+    word_count: int
+    media_count: int
+    link_count: int
+    monthly: pd.DataFrame  # year, month, message, time
+    daily: pd.DataFrame  # date, message
+    hourly: pd.Series  # messages per hour of day
+    heatmap: pd.DataFrame  # Day_name x hour
+    emojis: pd.DataFrame  # top 10 (emoji, count)
+    links: pd.DataFrame  # Date, user, Links, domain
+    domains: pd.DataFrame  # links per domain and user
+    # chat-wide sections, only filled in for 'Overall'
+    active_users: Optional[dict] = None
+    response_time: Optional[ResponseTimeReport] = None
+
+
+def _section(index, name, user, compute, **params):
+    # each dashboard section is computed on first use and memoised per user on the ChatIndex,
+    # so the app only pays for the sections that are actually opened. An index with a key also
+    # shares its results with every other session / process through the result cache
+    if index.key is not None:
+        compute = functools.partial(result_cache.get_default_cache().get_or_compute,
+                                    index.key, name, user, compute, **params)
+    return index.memo(('section', name, user, *sorted(params.items())), compute)
+
+
+@profiling.timed()
+def summary(index, user='Overall'):
+    # (messages, words, media, links) for the top-of-page metrics
+    return _section(index, 'summary', user, lambda: rollup.for_chat(index).totals(user))
+
+
+@profiling.timed()
+def timelines(index, user='Overall'):
+    # (monthly, daily, hourly, heatmap), all reductions of the chat's rollup cube
+    def compute():
+        cube = rollup.for_chat(index)
+        return cube.monthly(user), cube.timeline(user), cube.hourly(user), cube.heatmap(user)
+    return _section(index, 'timelines', user, compute)
+
+
+@profiling.timed()
+def emojis(index, user='Overall'):
+    return _section(index, 'emojis', user, lambda: helper.emoji_counter(user, index))
+
+
+@profiling.timed()
+def link_tables(index, user='Overall'):
+    # (links, domains)
+    def compute():
+        table = links.user_links(index, user)
+        return table, links.domain_summary(table)
+    return _section(index, 'links', user, compute)
+
+
+@profiling.timed()
+def active_users(index):
+    return _section(index, 'active_users', 'Overall', lambda: helper.most_active_user(index))
+
+
+@profiling.timed()
+def response_times(index, cutoff_minutes=response_time.DEFAULT_CUTOFF_MINUTES):
+    return _section(index, 'response_time', 'Overall', lambda: response_time.analyze(index, cutoff_minutes),
+                    cutoff_minutes=cutoff_minutes)
+
+
+@profiling.timed()
+def wordcloud(index, user='Overall'):
+    # PNG bytes, or None when there are no words to draw
+    return _section(index, 'wordcloud', user, lambda: helper.wordcloud_png(user, index))
+
+
+@profiling.timed()
+def analyze(df, user='Overall', cutoff_minutes=response_time.DEFAULT_CUTOFF_MINUTES):
+    # every dashboard section for one user; the sections are shared with (and memoised like)
+    # the per-section functions above, instead of each helper rescanning the whole chat
+    index = df if isinstance(df, ChatIndex) else ChatIndex(df)
+    num_messages, word_count, media_count, link_count = summary(index, user)
+    monthly, daily, hourly, heatmap = timelines(index, user)
+    link_table, domains = link_tables(index, user)
+
+    result = ChatAnalysis(
+        user=user,
+        num_messages=num_messages,
+        word_count=word_count,
+        media_count=media_count,
+        link_count=link_count,
+        monthly=monthly,
+        daily=daily,
+        hourly=hourly,
+        heatmap=heatmap,
+        emojis=emojis(index, user),
+        links=link_table,
+        domains=domains,
+    )
+
+    if user == 'Overall':
+        result.active_users = active_users(index)
+        result.response_time = response_times(index, cutoff_minutes)
+    return result
@@ -2,16 +2,282 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import matplotlib.pyplot as plt
-import helper
+import analysis
+import chat_cache
+import chat_index
+import chat_parser
+import chat_source
+import plotting
+import profiling
+import response_time
+import result_cache
+import search_index
+import functools
 import zipfile
-import io
 import base64
-from io import BytesIO
 
 
-@st.cache_data
-def preprocess_data(file_data):
-    return helper.preprocess(file_data)
+def preprocess_data(uploaded_file, key):
+    # parsed chats are cached on disk by content hash, so re-uploads and restarts skip parsing.
+    # otherwise the transcript is streamed out of the upload (decompressed and decoded chunk by
+    # chunk) straight into the parser, without full in-memory copies of the export
+    with chat_source.open_chat(uploaded_file) as stream:
+        return chat_cache.load_or_parse(stream, digest=key)
+
+def load_chat(uploaded_file):
+    # the parsed chat and its index (with everything memoised on it) live for the whole session,
+    # so reruns triggered by widgets don't recompute them. Hashing reads the whole upload, so it
+    # only happens when a new file arrives (a new file_id), not on every widget click
+    if st.session_state.get("chat_file_id") == uploaded_file.file_id:
+        return st.session_state["chat_index"]
+    key = chat_source.source_hash(uploaded_file)
+    if st.session_state.get("chat_key") != key:
+        # keyed by content hash, so analysis results are shared with every session that uploads
+        # the same export (result_cache.py)
+        st.session_state["chat_index"] = chat_index.ChatIndex(preprocess_data(uploaded_file, key), key=key)
+        st.session_state["chat_key"] = key
+        st.session_state["show_analysis"] = False
+    st.session_state["chat_file_id"] = uploaded_file.file_id
+    return st.session_state["chat_index"]
+
+def session_profiler():
+    # this session's profiler while "Record performance" is switched on, else None
+    if not st.session_state.get("record_performance"):
+        return None
+    if "profiler" not in st.session_state:
+        st.session_state["profiler"] = profiling.Profiler()
+    return st.session_state["profiler"]
+
+def section(func):
+    # a dashboard section rendered as a fragment; recorded as one stage, so its time minus the
+    # nested helper stages is what rendering and plotting cost
+    @functools.wraps(func)
+    def render(*args):
+        profiling.activate(session_profiler())  # fragment reruns don't go through the top of the script
+        with profiling.stage(f'app.{func.__name__}'):
+            return func(*args)
+    return st.fragment(render)
+
+def plot_chart(fig):
+    with profiling.stage('app.plot_chart'):
+        st.plotly_chart(fig)
+
+def open_section(title, key, value=True):
+    # a section's data is only computed while its toggle is on
+    return st.toggle(title, value=value, key=key)
+
+@section
+def activity_section(index, selected_user):
+    if not open_section("Activity over time", "section_activity"):
+        return
+    temp, daily_temp, _, heatmap = analysis.timelines(index, selected_user)
+
+    # Monthly Activity
+    st.subheader("Monthly Activity Overview")
+    st.caption("Hover over the chart to see detailed information.")
+    fig = plotting.line_chart(temp, 'time', 'message', "Messages Over Time", color_discrete_sequence=['green'])
+    fig.update_layout(
+
+        hoverlabel=dict(
+            font_size=14,
+            font_family="Arial",
+            font_color="blue",  # Tooltip text color
+            bgcolor="black"  # Tooltip background color
+        )
+    )
+
+    fig.update_traces(
+        textfont=dict(color="black"),
+    )
+    plot_chart(fig)
+
+    # Daily Activity
+    st.subheader("Daily Message Trends")
+    st.caption("Hover over the chart to see detailed information.")
+    # multi-year chats have thousands of days: plotted downsampled, or as weekly / monthly totals
+    method = "lttb"
+    if len(daily_temp) > plotting.MAX_POINTS:
+        method = st.radio("Long timeline", ["lttb", "buckets"], horizontal=True, key="daily_downsampling",
+                          format_func={"lttb": "Every peak, fewer points", "buckets": "Weekly / monthly totals"}.get)
+    fig = plotting.line_chart(daily_temp, 'date', 'message', "Messages Per Day", method=method,
+                              color_discrete_sequence=['red'])
+    fig.update_layout(
+
+        hoverlabel=dict(
+            font_size=14,
+            font_family="Arial",
+            font_color="blue",  # Tooltip text color
+            bgcolor="black"  # Tooltip background color
+        )
+    )
+
+    fig.update_traces(
+        textfont=dict(color="black"),
+    )
+    plot_chart(fig)
+
+    # Weekly Activity Heatmap
+    st.subheader("Weekly Activity Heatmap")
+    st.caption("The darker the area, the higher the message frequency at the corresponding day and time. Hover to see details")
+    fig = px.imshow(heatmap,color_continuous_scale='Blues', title="Messages Heatmap",
+                    labels={'x': 'Hour of the Day', 'y': 'Day of the Week'}, text_auto=True)
+    fig.update_layout(
+
+        hoverlabel=dict(
+            font_size=14,
+            font_family="Arial",
+            font_color="blue",  # Tooltip text color
+            bgcolor="black"  # Tooltip background color
+        )
+    )
+    fig.update_xaxes(
+        tickmode="array",
+        tickvals=list(range(24)),  # Assuming 24-hour format
+        ticktext=[f"{i}" for i in range(24)]  # Custom labels
+    )
+
+    fig.update_traces(
+        textfont=dict(color="black"),
+        hovertemplate="Hour: %{x}<br>Day: %{y}<extra></extra>"
+    )
+    plot_chart(fig)
+
+@section
+def wordcloud_section(index, selected_user):
+    # the most expensive section, closed until asked for
+    if not open_section("Most frequently used words", "section_wordcloud", value=False):
+        return
+    st.subheader("Most Frequently Used Words")
+    st.caption("The larger the word, the more frequently it appears in the conversation.")
+    wordcloud = analysis.wordcloud(index, selected_user)
+
+    # Display image in Streamlit
+    if wordcloud is None:
+        st.write('No words to show')
+    else:
+        st.image(wordcloud, use_container_width=True)
+
+@section
+def emoji_section(index, selected_user):
+    if not open_section("Emoji usage", "section_emoji"):
+        return
+    # Emoji Analysis
+    st.subheader("Emoji Usage Analysis")
+    col1, col2 = st.columns(2)
+    emojis = analysis.emojis(index, selected_user)
+    with col1:
+        if emojis is None or emojis.empty:
+            st.write('No emojis found')
+        else:
+            st.dataframe({"Emoji": emojis[0], "Count": emojis[1]},hide_index=True, use_container_width=True)
+    with col2:
+        if emojis is None or emojis.empty:
+            pass
+        else:
+            df_emoji = pd.DataFrame({"Emoji": emojis[0], "Count": emojis[1]})
+            fig = px.pie(df_emoji, names="Emoji", values="Count", title="Most Used Emojis",
+                         color_discrete_sequence=px.colors.qualitative.Pastel)
+
+            fig.update_layout(
+                paper_bgcolor="rgba(0,0,0,0)",  # Fully transparent background
+                plot_bgcolor="rgba(0,0,0,0)",  # Transparent plot area
+                hoverlabel=dict(
+                    font_size=14,
+                    font_family="Arial",
+                    font_color="blue",  # Tooltip text color
+                    bgcolor="black"  # Tooltip background color
+                )
+            )
+
+            fig.update_traces(
+                textfont=dict(color="black"),
+            )
+
+            plot_chart(fig)
+
+@section
+def links_section(index, selected_user):
+    if not open_section("Links shared", "section_links"):
+        return
+    st.subheader('LLinks Shared in the Chat')
+    links_df, domains = analysis.link_tables(index, selected_user)
+    if links_df is None or links_df.empty:
+        st.write('No links found in the chat')
+    else:
+        st.dataframe(links_df[['Date', 'user', 'Links']], use_container_width=True,hide_index=True)
+        st.markdown('Links per domain')
+        st.dataframe(domains, use_container_width=True, hide_index=True)
+
+@section
+def participants_section(index):
+    if not open_section("Most active participants", "section_participants"):
+        return
+    dic=analysis.active_users(index)
+    dataframe=pd.DataFrame(dic)
+    dataframe=dataframe.sort_values('counts', ascending=False)
+
+    st.subheader("Most to least active Participants")
+    st.dataframe(dataframe, use_container_width=True, hide_index=True)
+
+@section
+def response_time_section(index, cutoff_minutes):
+    # closed until asked for; the report is cached per cutoff like every other section
+    if not open_section("Response time analysis", "section_response_time", value=False):
+        return
+    st.subheader("Response Time Analysis")
+    st.caption("Analyzing how quickly users respond to messages.")
+    # response time: one computation shared by the histogram and the tables
+    report = analysis.response_times(index, cutoff_minutes)
+    fig = px.histogram(report.responses['Response time (minutes)'], title='Overall response time',
+                 color_discrete_sequence=px.colors.qualitative.Pastel, log_y=True,
+                       labels={'value': 'Response time (minutes)', 'count': 'Number of messages'}
+                 )
+
+    fig.update_layout(
+        showlegend=False,
+        hoverlabel=dict(
+            font_size=14,
+            font_family="Arial",
+            font_color="blue",  # Tooltip text color
+            bgcolor="black"  # Tooltip background color
+        )
+    )
+
+    fig.update_traces(
+        textfont=dict(color="black")
+    )
+    plot_chart(fig)
+
+    col1,col2=st.columns(2)
+    with col1:
+        st.markdown('Response time per user')
+        st.dataframe(report.by_user,hide_index=True,use_container_width=True)
+    with col2:
+        st.markdown('Response time over days')
+        st.dataframe(report.by_day,hide_index=True, use_container_width=True)
+
+    st.markdown('Response time per pair (who replies to whom)')
+    st.dataframe(report.by_pair, hide_index=True, use_container_width=True)
+    st.caption(f"Median / P90 / P99 are within {response_time.RELATIVE_ACCURACY:.0%} of the exact value.")
+
+SEARCH_RESULTS_SHOWN = 500
+
+@section
+def search_section():
+    # searches the whole chat through its inverted index (built on first search and stored next
+    # to the cached chat), restricted to the dates / participants picked under "Filter messages"
+    query = st.text_input("Search messages", placeholder='e.g. cricket "lunch meeting" dead*',
+                          help='Words must all appear; "quotes" for a phrase, * for a prefix.')
+    if not query.strip():
+        return
+    chat = st.session_state["chat_index"]
+    start, end, users = st.session_state.get("chat_filter") or (None, None, None)
+    index = search_index.for_chat(chat, chat_cache.get_default_cache(), st.session_state["chat_key"])
+    results = search_index.search(chat, query, start, end, users, index=index)
+    st.caption(f"{len(results):,} matching messages")
+    if len(results):
+        st.dataframe(results[['timestamp', 'user', 'message']].head(SEARCH_RESULTS_SHOWN),
+                     hide_index=True, use_container_width=True)
 
 def set_bg_from_local(image_path):
 
@@ -37,6 +303,7 @@ set_bg_from_local("backgroundImage2.jpg")
 
 
 st.title("WhatsApp Chat Analyzer")
+profiling.activate(session_profiler())
 
 with st.expander("About this tool"):
     st.markdown(
@@ -67,37 +334,60 @@ with st.expander("Upload WhatsApp Chat File"):
     uploaded_file = st.file_uploader("Choose a .txt or .zip file")
 
 if uploaded_file is not None:
-    # Handling ZIP files
-    if uploaded_file.name.endswith('.zip'):
-        try:
-            with zipfile.ZipFile(io.BytesIO(uploaded_file.getvalue()), 'r') as z:
-                txt_files = [f for f in z.namelist() if f.endswith('.txt')]
-                if txt_files:
-                    with z.open(txt_files[0]) as f:
-                        data = f.read().decode(errors="ignore")
-                else:
-                    st.error("No valid WhatsApp chat text file found in the ZIP.")
-                    st.stop()
-        except zipfile.BadZipFile:
-            st.error("Invalid ZIP file. Please upload a valid WhatsApp chat export.")
-            st.stop()
-    else:
-        data = uploaded_file.getvalue().decode(errors="ignore")
-
     # Preprocess Data
-    df = helper.preprocess(data)
+    # per-user row positions, built once and shared by every helper call below
+    try:
+        with profiling.stage('app.load_chat', bytes=uploaded_file.size):
+            index = load_chat(uploaded_file)
+    except zipfile.BadZipFile:
+        st.error("Invalid ZIP file. Please upload a valid WhatsApp chat export.")
+        st.stop()
+    except chat_source.NoChatFileError as error:
+        st.error(str(error))
+        st.stop()
+    except chat_parser.TimestampFormatError as error:
+        st.error(f"Could not read the timestamps in this chat: {error}")
+        st.stop()
+
+    # date window / participants: the rest of the page works on a ChatIndex over just those rows
+    start = end = users = None
+    with st.expander("Filter messages"):
+        first, last = index.span
+        if first is not None:
+            window = st.date_input("Date range", value=(first.date(), last.date()),
+                                   min_value=first.date(), max_value=last.date())
+            if len(window) == 2:
+                if window[0] > first.date():
+                    start = pd.Timestamp(window[0])
+                if window[1] < last.date():
+                    end = pd.Timestamp(window[1]) + pd.Timedelta(days=1)
+        users = st.multiselect("Participants", sorted(index.participants),
+                               placeholder="Everyone") or None
+    index = index.query(start, end, users)
+    st.session_state["chat_filter"] = (start, end, users and tuple(sorted(users)))
+
+    search_section()
 
     user_analysis = st.toggle("Analyze Specific User", value=False)
     selected_user = "Overall"
 
     if user_analysis:
-        user_list = sorted(set(df['user']) - {"group_notification","Meta AI"})
+        user_list = sorted(index.participants)
         user_list.insert(0, "Overall")
         selected_user = st.selectbox("Select a user", user_list)
 
+    cutoff_minutes = st.number_input("Reply cutoff (minutes)", min_value=1,
+                                     value=response_time.DEFAULT_CUTOFF_MINUTES,
+                                     help="Longer gaps are treated as a new conversation, not a reply.")
+
     if st.button("Show Analysis"):
-        # Top Statistics
-        num_messages, length, media_len, len_links = helper.calculate_stats(selected_user, df)
+        st.session_state["show_analysis"] = True
+
+    if st.session_state.get("show_analysis"):
+        # the metrics come first and cost one pass over the selected rows; every other section is
+        # a fragment that computes its data only when opened, so opening or closing one reruns
+        # just that section and never waits on the word cloud or the response times
+        num_messages, length, media_len, len_links = analysis.summary(index, selected_user)
         st.subheader("Chat Summary")
         col1, col2 = st.columns(2)
         with col1:
@@ -107,171 +397,37 @@ if uploaded_file is not None:
             st.metric("Total Words", length)
             st.metric("Links Shared", len_links)
 
-        # Monthly Activity
-        st.subheader("Monthly Activity Overview")
-        st.caption("Hover over the chart to see detailed information.")
-        temp = helper.monthly_timeline(selected_user, df)
-        fig = px.line(temp, x='time', y='message', markers=True, title="Messages Over Time",
-                      line_shape='spline', color_discrete_sequence=['green'])
-        fig.update_layout(
-
-            hoverlabel=dict(
-                font_size=14,
-                font_family="Arial",
-                font_color="blue",  # Tooltip text color
-                bgcolor="black"  # Tooltip background color
-            )
-        )
-
-        fig.update_traces(
-            textfont=dict(color="black"),
-        )
-        st.plotly_chart(fig)
-
-        # Daily Activity
-        st.subheader("Daily Message Trends")
-        st.caption("Hover over the chart to see detailed information.")
-        daily_temp = helper.daily_activity(selected_user, df)
-        fig = px.line(daily_temp, x='date', y='message', markers=True, title="Messages Per Day",
-                      line_shape='spline', color_discrete_sequence=['red'])
-        fig.update_layout(
-
-            hoverlabel=dict(
-                font_size=14,
-                font_family="Arial",
-                font_color="blue",  # Tooltip text color
-                bgcolor="black"  # Tooltip background color
-            )
-        )
-
-        fig.update_traces(
-            textfont=dict(color="black"),
-        )
-        st.plotly_chart(fig)
-
-        # Weekly Activity Heatmap
-        st.subheader("Weekly Activity Heatmap")
-        st.caption("The darker the area, the higher the message frequency at the corresponding day and time. Hover to see details")
-        heatmap = helper.weekly_activity_heatmap(selected_user, df)
-        fig = px.imshow(heatmap,color_continuous_scale='Blues', title="Messages Heatmap",
-                        labels={'x': 'Hour of the Day', 'y': 'Day of the Week'}, text_auto=True)
-        fig.update_layout(
-
-            hoverlabel=dict(
-                font_size=14,
-                font_family="Arial",
-                font_color="blue",  # Tooltip text color
-                bgcolor="black"  # Tooltip background color
-            )
-        )
-        fig.update_xaxes(
-            tickmode="array",
-            tickvals=list(range(24)),  # Assuming 24-hour format
-            ticktext=[f"{i}" for i in range(24)]  # Custom labels
-        )
+        activity_section(index, selected_user)
+        wordcloud_section(index, selected_user)
+        emoji_section(index, selected_user)
+        links_section(index, selected_user)
 
-        fig.update_traces(
-            textfont=dict(color="black"),
-            hovertemplate="Hour: %{x}<br>Day: %{y}<extra></extra>"
-        )
-        st.plotly_chart(fig)
-
-        # Wordcloud
-
-        st.subheader("Most Frequently Used Words")
-        st.caption("The larger the word, the more frequently it appears in the conversation.")
-        wc = helper.create_wordcloud(selected_user, df)
-
-        img_path = "wordcloud.png"
-        wc.to_file(img_path)
-
-        # Display image in Streamlit
-        st.image(img_path, use_container_width=True)
-
-        # Emoji Analysis
-        st.subheader("Emoji Usage Analysis")
-        col1, col2 = st.columns(2)
+        if selected_user=='Overall':
+            participants_section(index)
+            response_time_section(index, cutoff_minutes)
+
+with st.expander("Performance"):
+    st.toggle("Record performance", key="record_performance",
+              help="Time every parsing, analysis and rendering stage of this session.")
+    profiler = st.session_state.get("profiler")
+    if profiler is not None and profiler.events:
+        st.dataframe(profiler.summary(), hide_index=True, use_container_width=True)
+        col1, col2, col3 = st.columns(3)
         with col1:
-            emojis = helper.emoji_counter(selected_user, df)
-            if emojis is None or emojis.empty:
-                st.write('No emojis found')
-            else:
-                st.dataframe({"Emoji": emojis[0], "Count": emojis[1]},hide_index=True, use_container_width=True)
+            st.download_button("Download JSON", profiler.to_json(), "profile.json", "application/json")
         with col2:
-            emojis = helper.emoji_counter(selected_user, df)
-
-            if emojis is None or emojis.empty:
-                pass
-            else:
-                df_emoji = pd.DataFrame({"Emoji": emojis[0], "Count": emojis[1]})
-                fig = px.pie(df_emoji, names="Emoji", values="Count", title="Most Used Emojis",
-                             color_discrete_sequence=px.colors.qualitative.Pastel)
-
-                fig.update_layout(
-                    paper_bgcolor="rgba(0,0,0,0)",  # Fully transparent background
-                    plot_bgcolor="rgba(0,0,0,0)",  # Transparent plot area
-                    hoverlabel=dict(
-                        font_size=14,
-                        font_family="Arial",
-                        font_color="blue",  # Tooltip text color
-                        bgcolor="black"  # Tooltip background color
-                    )
-                )
-
-                fig.update_traces(
-                    textfont=dict(color="black"),
-                )
-
-                st.plotly_chart(fig)
-
-        st.subheader('LLinks Shared in the Chat')
-        links_df=helper.find_links(df,selected_user)
-        if links_df is None or links_df.empty:
-            st.write('No links found in the chat')
-        else:
-            st.dataframe(links_df, use_container_width=True,hide_index=True)
-
-
-        if selected_user=='Overall':
-            dic=helper.most_active_user(df)
-            dataframe=pd.DataFrame(dic)
-            dataframe=dataframe.sort_values('counts', ascending=False)
-
-            st.subheader("Most to least active Participants")
-            st.dataframe(dataframe, use_container_width=True, hide_index=True)
-
-
-            st.subheader("Response Time Analysis")
-            st.caption("Analyzing how quickly users respond to messages.")
-            # response time
-            response_time_df= helper.calculate_response_time(df)
-            fig = px.histogram(response_time_df['Response time (minutes)'], title='Overall response time',
-                         color_discrete_sequence=px.colors.qualitative.Pastel, log_y=True,
-                               labels={'value': 'Response time (minutes)', 'count': 'Number of messages'}
-                         )
-
-            fig.update_layout(
-                showlegend=False,
-                hoverlabel=dict(
-                    font_size=14,
-                    font_family="Arial",
-                    font_color="blue",  # Tooltip text color
-                    bgcolor="black"  # Tooltip background color
-                )
-            )
-
-            fig.update_traces(
-                textfont=dict(color="black")
-            )
-            st.plotly_chart(fig)
-
-            col1,col2=st.columns(2)
-            with col1:
-                st.markdown('Average response time per user')
-                avg_response_time = helper.average_response_time_user(df)
-                st.dataframe(avg_response_time,hide_index=True,use_container_width=True)
-            with col2:
-                st.markdown('Average response time over days')
-                day_response=helper.day_wise_response_time(df)
-                st.dataframe(day_response,hide_index=True, use_container_width=True)
-
+            st.download_button("Download Chrome trace", profiler.to_chrome_trace(), "trace.json", "application/json")
+        with col3:
+            if st.button("Clear"):
+                profiler.clear()
+                st.rerun()
+    elif st.session_state.get("record_performance"):
+        st.write("Nothing recorded yet.")
+    # shared by every session and process on this server
+    stats = result_cache.get_default_cache().stats()
+    st.caption("Shared result cache")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hit rate", "-" if stats['hit_rate'] is None else f"{stats['hit_rate']:.0%}")
+    col2.metric("Hits / misses", f"{stats['hits']:,} / {stats['misses']:,}")
+    col3.metric("Entries", f"{stats['entries']:,}")
+    col4.metric("Size", f"{stats['bytes'] / 1e6:.1f} MB")
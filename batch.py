@@ -0,0 +1,260 @@
+# headless batch mode: analyse many exported chats without the Streamlit app.
+# usage: python batch.py EXPORTS_DIR_OR_GLOB [...] -o OUT_DIR [--format json|parquet] [--workers N] [--store DIR]
+#
+# every .txt / .zip export is parsed with helper.preprocess and summarised with analysis.analyze
+# in a process pool. Each chat's metrics are written to OUT_DIR, and OUT_DIR/manifest.json
+# remembers the content hash of every input so unchanged exports are skipped on the next run.
+# with --store DIR the parsed chats and their aggregates are kept in DIR (incremental.ChatStore),
+# so a nightly re-export of the same chat only parses the messages added since the last run.
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import analysis
+import chat_cache
+import chat_index
+import chat_source
+import helper
+import incremental
+import response_time
+
+EXTENSIONS = ('.txt', '.zip')
+MANIFEST = 'manifest.json'
+# bump when the output layout changes so every chat is written again
+OUTPUT_VERSION = 1
+
+
+def find_exports(inputs):
+    # files, directories (searched recursively) and glob patterns, in a stable order
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*')
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path) and path.lower().endswith(EXTENSIONS):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def read_export(path):
+    # raw bytes of the chat: the file itself, or the chat transcript inside a .zip export
+    with open(path, 'rb') as file, chat_source.open_chat(file) as stream:
+        return stream.read()
+
+
+def output_name(path):
+    # readable and unique even when exports in different folders share a file name
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+
+
+def pairs(table, columns):
+    # the (item, count) tables of most_common_words / emoji_counter have no columns at all when
+    # the chat has no words or emoji; rebuilt from their rows they always get these columns
+    return pd.DataFrame(list(table.itertuples(index=False, name=None)), columns=columns)
+
+
+def chat_metrics(df, cutoff_minutes=response_time.DEFAULT_CUTOFF_MINUTES):
+    # (summary, tables) for one parsed chat (a frame or a ChatIndex), from the same functions
+    # the dashboard uses
+    index = df if isinstance(df, chat_index.ChatIndex) else chat_index.ChatIndex(df)
+    df = index.df
+    result = analysis.analyze(index, 'Overall', cutoff_minutes)
+    summary = {
+        'messages': result.num_messages,
+        'words': result.word_count,
+        'media': result.media_count,
+        'links': result.link_count,
+        'participants': len(index.participants),
+        'first_message': str(df['timestamp'].min()) if len(df) else None,
+        'last_message': str(df['timestamp'].max()) if len(df) else None,
+        'date_format': df.attrs.get('date_format'),
+    }
+    stats = pd.DataFrame([(user, *helper.calculate_stats(user, index)) for user in index.participants],
+                         columns=['user', 'messages', 'words', 'media', 'links'])
+    report = result.response_time
+    tables = {
+        'user_stats': stats,
+        'monthly': result.monthly,
+        'daily': result.daily,
+        'hourly': result.hourly.reset_index(),
+        'heatmap': result.heatmap.reset_index(),
+        'words': pairs(helper.most_common_words('Overall', index), ['word', 'count']),
+        'emojis': pairs(result.emojis, ['emoji', 'count']),
+        'domains': result.domains,
+        'response_time_by_user': report.by_user,
+        'response_time_by_pair': report.by_pair,
+        'response_time_by_day': report.by_day,
+    }
+    for name, table in tables.items():
+        table = table.copy()
+        table.columns = [str(column) for column in table.columns]
+        tables[name] = table
+    return summary, tables
+
+
+def write_json(path, summary, tables):
+    payload = {'summary': summary,
+               'tables': {name: json.loads(table.to_json(orient='records', date_format='iso'))
+                          for name, table in tables.items()}}
+    with open(path + '.json', 'w', encoding='utf-8') as file:
+        json.dump(payload, file, ensure_ascii=False, indent=1)
+
+
+def write_parquet(path, summary, tables):
+    # one Parquet file per table next to the summary
+    os.makedirs(path, exist_ok=True)
+    for name, table in tables.items():
+        table.to_parquet(os.path.join(path, f'{name}.parquet'), index=False)
+    with open(os.path.join(path, 'summary.json'), 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=1)
+
+
+WRITERS = {'json': write_json, 'parquet': write_parquet}
+
+
+def process_export(path, out_path, fmt='json', cutoff_minutes=response_time.DEFAULT_CUTOFF_MINUTES,
+                   dayfirst=None, store_dir=None):
+    # runs in a worker process; returns the file's timings instead of raising, so one bad
+    # export doesn't stop the batch
+    timings = {}
+    record = {'path': path, 'output': out_path}
+    try:
+        start = time.perf_counter()
+        data = read_export(path)
+        timings['read'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if store_dir is None:
+            df = helper.preprocess(data, dayfirst=dayfirst, compact=True)
+        else:
+            chat = incremental.ChatStore(store_dir).ingest(data, dayfirst=dayfirst)
+            df = chat.index()
+            record['ingest'] = chat.status
+        timings['parse'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary, tables = chat_metrics(df, cutoff_minutes)
+        timings['analyze'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        WRITERS[fmt](out_path, summary, tables)
+        timings['write'] = time.perf_counter() - start
+        record.update(status='ok', hash=chat_cache.content_hash(data), bytes=len(data), messages=summary['messages'])
+    except Exception as error:
+        record.update(status='failed', error=f'{type(error).__name__}: {error}')
+    record['timings'] = timings
+    return record
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest if manifest.get('version') == OUTPUT_VERSION else {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def is_unchanged(entry, data_hash, options):
+    return (entry is not None and entry.get('status') == 'ok' and entry.get('hash') == data_hash
+            and entry.get('options') == options and os.path.exists(entry['output'] + entry['suffix']))
+
+
+def run(inputs, out_dir, fmt='json', workers=None, cutoff_minutes=response_time.DEFAULT_CUTOFF_MINUTES,
+        dayfirst=None, force=False, log=print, store_dir=None):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    entries = manifest.get('files', {})
+    options = {'format': fmt, 'cutoff_minutes': cutoff_minutes, 'dayfirst': dayfirst}
+    suffix = '.json' if fmt == 'json' else ''
+
+    # hashing reads every input once; that is cheap next to parsing the ones that changed
+    pending, skipped = [], 0
+    for path in find_exports(inputs):
+        entry = entries.get(path)
+        if not force and entry is not None:
+            try:
+                data_hash = chat_cache.content_hash(read_export(path))
+            except (OSError, ValueError, zipfile.BadZipFile):
+                data_hash = None
+            if is_unchanged(entry, data_hash, options):
+                skipped += 1
+                continue
+        pending.append(path)
+
+    log(f"{len(pending)} to process, {skipped} unchanged")
+    start = time.perf_counter()
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_export, path, os.path.join(out_dir, output_name(path)), fmt,
+                               cutoff_minutes, dayfirst, store_dir) for path in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            record.update(options=options, suffix=suffix)
+            records.append(record)
+            entries[record['path']] = record
+            if record['status'] == 'ok':
+                timings = ' '.join(f"{stage} {seconds:.2f}s" for stage, seconds in record['timings'].items())
+                ingest = f", {record['ingest']}" if 'ingest' in record else ''
+                log(f"ok      {record['path']}: {record['messages']:,} messages{ingest} ({timings})")
+            else:
+                log(f"failed  {record['path']}: {record['error']}")
+    elapsed = time.perf_counter() - start
+
+    done = [record for record in records if record['status'] == 'ok']
+    messages = sum(record['messages'] for record in done)
+    size = sum(record['bytes'] for record in done)
+    summary = {
+        'processed': len(done),
+        'failed': len(records) - len(done),
+        'skipped': skipped,
+        'messages': messages,
+        'megabytes': size / 1e6,
+        'seconds': elapsed,
+        'messages_per_second': messages / elapsed if elapsed else 0.0,
+        'megabytes_per_second': size / 1e6 / elapsed if elapsed else 0.0,
+    }
+    save_manifest(out_dir, {'version': OUTPUT_VERSION, 'files': entries, 'last_run': summary})
+    log(f"{summary['processed']} processed, {summary['failed']} failed, {skipped} skipped in {elapsed:.1f}s: "
+        f"{summary['messages_per_second']:,.0f} messages/s, {summary['megabytes_per_second']:.1f} MB/s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse exported WhatsApp chats without the dashboard.")
+    parser.add_argument('inputs', nargs='+', help=".txt / .zip exports, directories or glob patterns")
+    parser.add_argument('-o', '--output', required=True, help="directory for the metrics and manifest")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='json')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: every core)")
+    parser.add_argument('--cutoff-minutes', type=float, default=response_time.DEFAULT_CUTOFF_MINUTES)
+    parser.add_argument('--dayfirst', choices=['auto', 'yes', 'no'], default='auto',
+                        help="DD/MM vs MM/DD timestamps (default: detect per chat)")
+    parser.add_argument('--force', action='store_true', help="re-process exports that have not changed")
+    parser.add_argument('--store', default=None, metavar='DIR',
+                        help="keep parsed chats in DIR so re-exports only parse their new messages")
+    args = parser.parse_args(argv)
+
+    dayfirst = {'auto': None, 'yes': True, 'no': False}[args.dayfirst]
+    summary = run(args.inputs, args.output, args.format, args.workers, args.cutoff_minutes, dayfirst, args.force,
+                  store_dir=args.store)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
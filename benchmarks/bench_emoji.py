@@ -0,0 +1,49 @@
+# usage: python -m benchmarks.bench_emoji [--messages 1000000] [--emoji-rates 0.2,0.6]
+import argparse
+import time
+from collections import Counter
+
+import emoji
+
+import emoji_extractor
+import helper
+from benchmarks.synthetic import generate_chat
+
+
+def legacy_emoji_counts(df):
+    # helper.emoji_counter before the extractor: one character at a time, per user
+    counts = Counter()
+    for user, message in zip(df['user'], df['message']):
+        for c in message:
+            if c in emoji.EMOJI_DATA:
+                counts[(user, c)] += 1
+    return counts
+
+
+def run(name, func, df):
+    start = time.perf_counter()
+    result = func(df)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {elapsed:8.2f}s {len(df) / elapsed:12,.0f} messages/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    # share of messages with emoji: a typical chat, and an emoji-heavy one
+    parser.add_argument('--emoji-rates', default='0.2,0.6')
+    args = parser.parse_args()
+
+    emoji_extractor.emoji_pattern()  # compile outside the timed section
+    for rate in map(float, args.emoji_rates.split(',')):
+        df = helper.preprocess(generate_chat(args.messages, emoji_rate=rate))
+        print(f"synthetic chat: {args.messages:,} messages, emoji rate {rate}")
+        legacy = run('legacy', legacy_emoji_counts, df)
+        counts = run('extractor', emoji_extractor.emoji_counts, df)
+        print(f"distinct (user, emoji): legacy {len(legacy):,}, extractor {len(counts):,} "
+              f"(ZWJ / skin-tone sequences no longer split into parts)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# usage: python -m benchmarks.bench_parallel [--messages 2000000] [--max-workers 8]
+import argparse
+import os
+import time
+
+import helper
+from benchmarks.synthetic import generate_chat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2_000_000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    chat = generate_chat(args.messages).encode('utf-8')
+    print(f"synthetic chat: {args.messages:,} messages, {len(chat) / 1e6:.1f} MB")
+
+    workers, baseline, expected = 1, None, None
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        df = helper.preprocess(chat, workers=workers)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            baseline, expected = elapsed, df
+        elif not df.equals(expected):
+            raise SystemExit(f"{workers} workers: output differs from the serial parser")
+        print(f"{workers:>3} workers {elapsed:8.2f}s {args.messages / elapsed:12,.0f} rows/s"
+              f"  speedup {baseline / elapsed:5.2f}x")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
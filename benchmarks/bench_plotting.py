@@ -0,0 +1,70 @@
+# usage: python -m benchmarks.bench_plotting [--years 1,3,10,30] [--repeat 3]
+# figure JSON size and build + serialisation time of the "Messages Per Day" chart: the old
+# px.line (every day, markers, spline) against plotting.line_chart downsampled with LTTB and as
+# weekly / monthly totals. Browser rendering can't be timed here; the JSON is what the browser
+# has to receive, parse and draw, and the trace type shows whether it draws with SVG or WebGL.
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import downsample
+import plotting
+
+
+def daily_frame(years, seed=0):
+    # date / message like helper.daily_activity, with a weekly rhythm, drift and the odd spike
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2015-01-01', periods=int(years * 365))
+    rate = 40 + 20 * np.sin(np.arange(len(dates)) * 2 * np.pi / 7) + np.linspace(0, 30, len(dates))
+    counts = rng.poisson(np.maximum(rate, 1))
+    counts[rng.random(len(dates)) < 0.005] *= 10
+    return pd.DataFrame({'date': dates.date, 'message': counts})
+
+
+def legacy(daily):
+    return px.line(daily, x='date', y='message', markers=True, title="Messages Per Day",
+                   line_shape='spline', color_discrete_sequence=['red'])
+
+
+def timed(build, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build()
+        payload = fig.to_json()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, fig, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', default='1,3,10,30')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'years':>5} {'days':>6}  {'chart':<8} {'points':>6} {'trace':<9} {'JSON':>9} {'build+json':>10}")
+    for years in [float(value) for value in args.years.split(',')]:
+        daily = daily_frame(years)
+        for name, build in (('legacy', lambda: legacy(daily)),
+                            ('lttb', lambda: plotting.line_chart(daily, 'date', 'message', "Messages Per Day")),
+                            ('buckets', lambda: plotting.line_chart(daily, 'date', 'message', "Messages Per Day",
+                                                                    method='buckets'))):
+            elapsed, fig, size = timed(build, args.repeat)
+            trace = fig.data[0]
+            print(f"{years:5g} {len(daily):6,}  {name:<8} {len(trace.x):6,} {trace.type:<9} "
+                  f"{size / 1e3:7.1f}kB {elapsed * 1e3:8.1f}ms")
+        # LTTB must keep the largest spike
+        kept = downsample.downsample(daily, 'date', 'message', plotting.MAX_POINTS)
+        assert kept['message'].max() == daily['message'].max()
+
+    heatmap = pd.DataFrame(np.random.default_rng(0).integers(0, 500, (7, 24)))
+    fig = px.imshow(heatmap, color_continuous_scale='Blues', text_auto=True)
+    print(f"weekday heatmap (7 x 24, text_auto): {len(fig.to_json()) / 1e3:.1f}kB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# usage: python -m benchmarks.bench_preprocess [--messages 1000000]
+import argparse
+import re
+import time
+
+import pandas as pd
+
+import chat_parser
+import helper
+from benchmarks.synthetic import generate_chat
+
+
+def legacy_preprocess(chat):
+    # helper.preprocess before the streaming parser, kept for comparison
+    pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s?[APM\u202F]*'
+    date = re.findall(pattern, chat)
+    text = re.split(pattern, chat)[1:]
+    text = [re.sub(r'\s*-\s*', '', x) for x in text]
+    df = pd.DataFrame({'timestamp': date, 'text': text})
+
+    df['text'] = df['text'].str.strip()
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='mixed')
+
+    name, message = [], []
+    for i in df['text']:
+        match = re.match(r'([\w\W]+?):\s', i)
+        if match:
+            name.append(match.group(1))
+            message.append(i[len(match.group(0)):])
+        else:
+            name.append('group_notification')
+            message.append(i)
+
+    df['user'] = name
+    df['message'] = message
+    df.drop(columns=['text'], inplace=True)
+
+    df['year'] = df['timestamp'].dt.year
+    df['month'] = df['timestamp'].dt.strftime('%b')
+    df['day'] = df['timestamp'].dt.day
+    df['hour'] = df['timestamp'].dt.hour
+    df['Day_name'] = df['timestamp'].dt.day_name()
+    df["date"] = df["timestamp"].dt.date
+
+    return df
+
+
+def legacy_split_and_dates(df):
+    name, message = [], []
+    for i in df['text']:
+        match = re.match(r'([\w\W]+?):\s', i)
+        if match:
+            name.append(match.group(1))
+            message.append(i[len(match.group(0)):])
+        else:
+            name.append('group_notification')
+            message.append(i)
+    df['user'] = name
+    df['message'] = message
+    df['month'] = df['timestamp'].dt.strftime('%b')
+    df['Day_name'] = df['timestamp'].dt.day_name()
+
+
+def split_and_dates(df):
+    parts = df['text'].str.extract(chat_parser.USER_MESSAGE)
+    df['user'] = parts[0].fillna('group_notification')
+    df['message'] = parts[1].fillna(df['text'])
+    timestamp = df['timestamp'].dt
+    df['month'] = pd.Categorical.from_codes(timestamp.month - 1, categories=chat_parser.MONTHS, ordered=True)
+    df['Day_name'] = pd.Categorical.from_codes(timestamp.dayofweek, categories=chat_parser.DAY_NAMES, ordered=True)
+
+
+def run(name, func, arg, rows):
+    start = time.perf_counter()
+    func(arg)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed:8.2f}s {rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    chat = generate_chat(args.messages)
+    print(f"synthetic chat: {args.messages:,} messages, {len(chat) / 1e6:.1f}M characters")
+    run('legacy preprocess', legacy_preprocess, chat, args.messages)
+    run('preprocess', helper.preprocess, chat, args.messages)
+
+    # the user / message split and month / weekday names on their own, without datetime parsing
+    df = helper.preprocess(chat)
+    texts = (df['user'] + ': ' + df['message']).where(df['user'] != 'group_notification', df['message'])
+    frame = pd.DataFrame({'timestamp': df['timestamp'], 'text': texts.astype(object)})
+    run('legacy split + names', legacy_split_and_dates, frame.copy(), args.messages)
+    run('vectorized split + names', split_and_dates, frame.copy(), args.messages)
+
+
+if __name__ == '__main__':
+    main()
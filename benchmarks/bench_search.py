@@ -0,0 +1,60 @@
+# usage: python -m benchmarks.bench_search [--messages 1000000] [--repeat 5]
+# search index build / save / load time and size, then query latency against a str.contains scan
+import argparse
+import os
+import tempfile
+import time
+
+import chat_index
+import helper
+import search_index
+from benchmarks.synthetic import generate_chat
+
+QUERIES = ['cricket', 'cricket match', '"lunch meeting"', 'dead*', 'awesome weekend trip']
+
+
+def timed(func, repeat=1):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    chat = chat_index.ChatIndex(helper.preprocess(generate_chat(args.messages)))
+    messages = chat.df['message'].astype(str).str.lower()
+    print(f"synthetic chat: {args.messages:,} messages, {messages.str.len().sum() / 1e6:.1f} MB of text")
+
+    elapsed, index = timed(lambda: search_index.SearchIndex.build(chat.df))
+    print(f"build   {elapsed:8.2f}s  {args.messages / elapsed:12,.0f} messages/s  "
+          f"{len(index.vocabulary):,} terms, {index.postings.nbytes / 1e6:.1f} MB of postings")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.npz')
+        elapsed, _ = timed(lambda: index.save(path))
+        print(f"save    {elapsed:8.2f}s  {os.path.getsize(path) / 1e6:.1f} MB on disk")
+        elapsed, _ = timed(lambda: search_index.SearchIndex.load(path), args.repeat)
+        print(f"load    {elapsed:8.3f}s")
+
+    first, last = chat.span
+    users = chat.participants[:3]
+    print(f"{'query':<26} {'hits':>9} {'index':>10} {'filtered':>10} {'scan':>10}")
+    for query in QUERIES:
+        indexed, hits = timed(lambda: search_index.search(chat, query, index=index), args.repeat)
+        filtered, _ = timed(lambda: search_index.search(chat, query, last - (last - first) / 10, None, users,
+                                                        index=index), args.repeat)
+        # the full scan a search box would otherwise run: one contains() per word
+        words = [word.strip('"*') for word in query.replace('"', ' ').split()]
+        scan, _ = timed(lambda: [messages.str.contains(word, regex=False) for word in words], args.repeat)
+        print(f"{query:<26} {len(hits):9,} {indexed * 1e3:8.1f}ms {filtered * 1e3:8.1f}ms {scan * 1e3:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# usage: python -m benchmarks.bench_sketches [--tokens 5000000] [--vocabulary 200000] [--messages 1000000]
+# accuracy and size of the approximate top-K counters (sketches.TopK) against an exact Counter
+# on a Zipf-distributed token stream split over several users and merged, then peak RSS of the
+# top words / emoji of a synthetic chat: exact (parse + Counter) against sketches.sketch_stream.
+# Each chat path runs in a fresh interpreter so the peaks don't mix.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+import sketches
+from benchmarks.synthetic import generate_chat
+
+BATCH = 50_000
+USERS = 4
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3  # kB on Linux
+
+
+def accuracy(num_tokens, vocabulary, k, zipf, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocabulary)], dtype=object)
+    stream = np.minimum(rng.zipf(zipf, num_tokens), vocabulary) - 1
+    exact = np.bincount(stream, minlength=vocabulary)
+
+    # one sketch per user, fed batch by batch, then merged like the Overall view
+    start = time.perf_counter()
+    per_user = [sketches.TopK(k) for _ in range(USERS)]
+    owners = rng.integers(0, USERS, num_tokens)
+    for offset in range(0, num_tokens, BATCH):
+        batch, batch_owners = stream[offset:offset + BATCH], owners[offset:offset + BATCH]
+        for user, sketch in enumerate(per_user):
+            sketch.add(words[batch[batch_owners == user]])
+    merged = sketches.TopK(k)
+    for sketch in per_user:
+        merged.merge(sketch)
+    elapsed = time.perf_counter() - start
+
+    top = merged.top()
+    truth = [words[i] for i in np.argsort(-exact, kind='stable')[:k]]
+    errors = np.array([count - exact[int(word[1:])] for word, count in top])
+    recall = len({word for word, _ in top} & set(truth)) / k
+    counter_bytes = sys.getsizeof(Counter(dict(zip(words, exact)))) + sum(sys.getsizeof(w) for w in words)
+    print(f"zipf s={zipf:<4} {elapsed:6.2f}s  top-{k} recall {recall:6.1%}  "
+          f"max error {errors.max():6,} (mean {errors.mean():8.1f}, bound {merged.error_bound():8.1f})  "
+          f"{merged.nbytes / 1e3:7.1f} kB vs exact Counter {counter_bytes / 1e6:6.1f} MB")
+
+
+def exact(path):
+    import chat_parser
+    import helper
+    with open(path, 'rb') as file:
+        df = chat_parser.parse(file)
+    return helper.most_common_words('Overall', df), helper.emoji_counter('Overall', df)
+
+
+def approximate(path):
+    with open(path, 'rb') as file:
+        chat = sketches.sketch_stream(file)
+    return chat.words(), chat.emojis()
+
+
+def child(mode, path):
+    import helper  # noqa: F401  (import cost is the same for both paths, keep it out of the delta)
+    with open('/proc/self/statm') as file:
+        before = int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    start = time.perf_counter()
+    words, emojis = {'exact': exact, 'sketch': approximate}[mode](path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'before_mb': before, 'peak_mb': peak_rss_mb(),
+                      'words': words.values.tolist(), 'emojis': emojis.values.tolist()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=5_000_000)
+    parser.add_argument('--vocabulary', type=int, default=200_000)
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    print(f"token stream: {args.tokens:,} tokens over {args.vocabulary:,} words, {USERS} users merged")
+    for zipf in (1.1, 1.3, 2.0):
+        accuracy(args.tokens, args.vocabulary, args.k, zipf)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'chat.txt')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(generate_chat(args.messages))
+        print(f"synthetic chat: {args.messages:,} messages, {os.path.getsize(path) / 1e6:.1f} MB")
+        results = {}
+        for mode in ('exact', 'sketch'):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_sketches', '--child', mode, path],
+                                    check=True, capture_output=True, text=True).stdout
+            results[mode] = result = json.loads(output)
+            print(f"{mode:>7} {result['seconds']:7.2f}s  peak RSS {result['peak_mb']:8.1f} MB"
+                  f"  (+{result['peak_mb'] - result['before_mb']:.1f} MB)")
+        for kind in ('words', 'emojis'):
+            truth = dict(map(tuple, results['exact'][kind]))
+            found = dict(map(tuple, results['sketch'][kind]))
+            error = max((count - truth.get(item, 0) for item, count in found.items()), default=0)
+            print(f"top {kind}: {len(truth.keys() & found.keys())}/{len(truth)} shared, max overestimate {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# usage: python -m benchmarks.bench_zip_ingest [--messages 2000000]
+# peak RSS of turning an uploaded .zip export into a parsed frame: the old app path
+# (getvalue() copy, whole member read, full decode) against chat_source streaming the member
+# into the parser. Each path runs in a fresh interpreter so the peaks don't mix.
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from benchmarks.synthetic import generate_chat
+
+
+def rss_mb():
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3  # kB on Linux
+
+
+def legacy(upload):
+    import chat_parser
+    with zipfile.ZipFile(io.BytesIO(upload.getvalue()), 'r') as z:
+        txt_files = [f for f in z.namelist() if f.endswith('.txt')]
+        with z.open(txt_files[0]) as f:
+            data = f.read().decode(errors="ignore")
+    return chat_parser.parse(data)
+
+
+def streaming(upload):
+    import chat_parser
+    import chat_source
+    chat_source.source_hash(upload)
+    with chat_source.open_chat(upload) as stream:
+        return chat_parser.parse(stream)
+
+
+def child(mode, path):
+    import helper  # noqa: F401  (import cost is the same for both paths, keep it out of the delta)
+    with open(path, 'rb') as file:
+        upload = io.BytesIO(file.read())  # what streamlit's UploadedFile holds
+    before = rss_mb()
+    start = time.perf_counter()
+    df = {'legacy': legacy, 'streaming': streaming}[mode](upload)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'rows': len(df), 'seconds': elapsed, 'before_mb': before, 'peak_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2_000_000)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    chat = generate_chat(args.messages).encode('utf-8')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'WhatsApp Chat with Team.zip')
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('WhatsApp Chat with Team.txt', chat)
+        print(f"synthetic chat: {args.messages:,} messages, {len(chat) / 1e6:.1f} MB "
+              f"({os.path.getsize(path) / 1e6:.1f} MB zipped)")
+        del chat
+
+        for mode in ('legacy', 'streaming'):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_zip_ingest', '--child', mode, path],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(f"{mode:>9} {result['seconds']:7.2f}s  peak RSS {result['peak_mb']:8.1f} MB"
+                  f"  (+{result['peak_mb'] - result['before_mb']:.1f} MB over the loaded upload)")
+
+
+if __name__ == '__main__':
+    main()
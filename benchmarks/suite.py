@@ -0,0 +1,165 @@
+# usage: python -m benchmarks.suite [--sizes 100k,1M,10M] [--formats android-12h,ios-24h]
+#                                    [--repeat 3] [--threshold 1.25] [--update-baselines]
+# times every helper.py function on synthetic chats and records its peak memory, then compares
+# against benchmarks/baselines.json and exits 1 when anything got slower (or bigger) than
+# threshold x its baseline. Each (format, size) runs in a fresh interpreter so peaks don't mix.
+# baselines are machine specific: refresh them with --update-baselines on the machine that
+# runs the suite. Sizes below 100k finish in milliseconds and only measure noise, so they have
+# no baselines; 10M needs well over 5 GB of RAM.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DEFAULT_SIZES = '100k,1M'
+DEFAULT_FORMATS = 'android-12h'
+# differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.5
+MIN_MEGABYTES = 32
+
+
+def parse_size(text):
+    scale = {'k': 10 ** 3, 'm': 10 ** 6}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _rss_mb(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1e3
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _reset_peak():
+    # linux: writing 5 to clear_refs resets the peak RSS (VmHWM) to the current RSS
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def cases():
+    # (name, function of (text, df)) for every function in helper.py; each gets a plain
+    # DataFrame, so nothing is served from a ChatIndex memo
+    import helper
+
+    return [
+        ('preprocess', lambda text, df: helper.preprocess(text)),
+        ('memory_report', lambda text, df: helper.memory_report(df)),
+        ('calculate_stats', lambda text, df: helper.calculate_stats('Overall', df)),
+        ('daily_activity', lambda text, df: helper.daily_activity('Overall', df)),
+        ('weekly_activity_heatmap', lambda text, df: helper.weekly_activity_heatmap('Overall', df)),
+        ('hourly_distribution', lambda text, df: helper.hourly_distribution('Overall', df)),
+        ('monthly_timeline', lambda text, df: helper.monthly_timeline('Overall', df)),
+        ('cleaned_message', lambda text, df: helper.cleaned_message(df)),
+        ('most_common_words', lambda text, df: helper.most_common_words('Overall', df)),
+        ('create_wordcloud', lambda text, df: helper.create_wordcloud('Overall', df)),
+        ('wordcloud_png', lambda text, df: helper.wordcloud_png('Overall', df)),
+        ('emoji_counter', lambda text, df: helper.emoji_counter('Overall', df)),
+        ('most_active_user', lambda text, df: helper.most_active_user(df)),
+        ('calculate_response_time', lambda text, df: helper.calculate_response_time(df)),
+        ('average_response_time_user', lambda text, df: helper.average_response_time_user(df)),
+        ('day_wise_response_time', lambda text, df: helper.day_wise_response_time(df)),
+        ('find_links', lambda text, df: helper.find_links(df, 'Overall')),
+    ]
+
+
+def child(chat_format, size, repeat):
+    import helper
+    from benchmarks.synthetic import generate_chat
+
+    text = generate_chat(size, format=chat_format)
+    df = helper.preprocess(text)
+    results = {}
+    for name, func in cases():
+        best, peak = None, None
+        for _ in range(repeat):
+            measured = _reset_peak()
+            before = _rss_mb('VmRSS')
+            start = time.perf_counter()
+            func(text, df)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            # growth over the RSS before the call; later repeats reuse freed memory, keep the largest
+            if measured:
+                peak = max(peak or 0.0, _rss_mb('VmHWM') - before)
+        results[name] = {'seconds': best, 'peak_mb': peak}
+    print(json.dumps(results))
+
+
+def run_size(chat_format, size, repeat):
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--child', chat_format, str(size),
+                             '--repeat', str(repeat)], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def compare(result, baseline, threshold):
+    # list of regression messages for one function
+    problems = []
+    if baseline is None:
+        return problems
+    seconds, base_seconds = result['seconds'], baseline['seconds']
+    if seconds > base_seconds * threshold and seconds - base_seconds > MIN_SECONDS:
+        problems.append(f"time {seconds:.3f}s vs baseline {base_seconds:.3f}s ({seconds / base_seconds:.2f}x)")
+    peak, base_peak = result.get('peak_mb'), baseline.get('peak_mb')
+    if peak is not None and base_peak is not None and peak > base_peak * threshold and peak - base_peak > MIN_MEGABYTES:
+        problems.append(f"peak {peak:.0f} MB vs baseline {base_peak:.0f} MB")
+    return problems
+
+
+def load_baselines():
+    try:
+        with open(BASELINES, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated, e.g. 10k,100k,1M,10M")
+    parser.add_argument('--formats', default=DEFAULT_FORMATS, help="comma separated synthetic.FORMATS")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per function, the fastest is kept")
+    parser.add_argument('--threshold', type=float, default=1.25, help="allowed slowdown over the baseline")
+    parser.add_argument('--update-baselines', action='store_true')
+    parser.add_argument('--child', nargs=2, metavar=('FORMAT', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child[0], int(args.child[1]), args.repeat)
+
+    baselines = load_baselines()
+    regressions = 0
+    for chat_format in args.formats.split(','):
+        for size in map(parse_size, args.sizes.split(',')):
+            print(f"{chat_format}, {size:,} messages")
+            results = run_size(chat_format, size, args.repeat)
+            stored = baselines.setdefault(chat_format, {}).setdefault(str(size), {})
+            for name, result in results.items():
+                problems = [] if args.update_baselines else compare(result, stored.get(name), args.threshold)
+                regressions += bool(problems)
+                peak = 'n/a' if result['peak_mb'] is None else f"{result['peak_mb']:7.1f} MB"
+                status = 'REGRESSION ' + '; '.join(problems) if problems else ('new' if name not in stored else 'ok')
+                print(f"  {name:<28} {result['seconds']:9.3f}s  peak {peak}  {status}")
+                if args.update_baselines:
+                    stored[name] = result
+
+    if args.update_baselines:
+        with open(BASELINES, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, indent=1, sort_keys=True)
+            file.write('\n')
+        print(f"baselines written to {BASELINES}")
+    elif regressions:
+        print(f"{regressions} regression(s) over {args.threshold}x the baseline")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
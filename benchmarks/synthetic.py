@@ -0,0 +1,67 @@
+import random
+from datetime import datetime, timedelta
+
+USERS = ['Aarav', 'Bishnu', 'Chitra', 'Deepak', 'Esha', 'Farhan', 'Gauri', 'Harsh']
+WORDS = ('hello bhai kal milte hai ok done yes no maybe lunch meeting project deadline code review '
+         'movie cricket match awesome thanks sorry please call later tomorrow today weekend trip').split()
+EMOJIS = ['😀', '😂', '👍', '❤️', '🙏', '🔥', '👍🏽', '👨‍👩‍👧']
+LINKS = ['https://example.com/post/{}', 'http://news.site.in/a/{}', 'https://youtu.be/{}']
+
+# export flavours: "<platform>-<clock>", e.g. "ios-24h"
+PLATFORMS = ('android', 'ios')
+CLOCKS = ('12h', '24h')
+FORMATS = tuple(f'{platform}-{clock}' for platform in PLATFORMS for clock in CLOCKS)
+
+MEDIA = {'android': '<Media omitted>', 'ios': '‎image omitted'}
+DELETED = {'android': 'This message was deleted', 'ios': '‎This message was deleted.'}
+
+
+def _message(rng, emoji_rate, platform='android', media_rate=0.05, link_rate=0.05, multiline_rate=0.05):
+    roll = rng.random()
+    if roll < media_rate:
+        return MEDIA[platform]
+    if roll < media_rate + 0.02:
+        return DELETED[platform]
+    words = rng.choices(WORDS, k=rng.randint(1, 12))
+    while rng.random() < emoji_rate:
+        words.append(rng.choice(EMOJIS))
+    if rng.random() < link_rate:
+        words.append(rng.choice(LINKS).format(rng.randint(1, 10 ** 6)))
+    text = ' '.join(words)
+    if rng.random() < multiline_rate:
+        text += '\n' + ' '.join(rng.choices(WORDS, k=rng.randint(1, 6)))
+    return text
+
+
+def _stamp(current, platform, clock):
+    if platform == 'android':
+        # "1/31/23, 9:05 PM - " or "31/01/2023, 21:05 - "
+        if clock == '12h':
+            return f"{current.month}/{current.day}/{current:%y}, {current.hour % 12 or 12}:{current:%M %p} - "
+        return f"{current:%d/%m/%Y, %H:%M} - "
+    # "[31/01/23, 9:05:07 PM] " or "[31/01/23, 21:05:07] "
+    if clock == '12h':
+        return f"[{current:%d/%m/%y}, {current.hour % 12 or 12}:{current:%M:%S %p}] "
+    return f"[{current:%d/%m/%y, %H:%M:%S}] "
+
+
+def generate_chat(num_messages, seed=0, start=datetime(2021, 1, 1), emoji_rate=0.2, format='android-12h',
+                  media_rate=0.05, link_rate=0.05, multiline_rate=0.05, notification_rate=0.01):
+    # emoji_rate: chance of appending an(other) emoji to a message; the other rates are the
+    # share of media placeholders, messages with a link, two-line messages and group notifications.
+    # format: one of FORMATS; android-12h is month-first, the others day-first
+    platform, clock = format.split('-')
+    if platform not in PLATFORMS or clock not in CLOCKS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    rng = random.Random(seed)
+    current = start
+    lines = []
+    for _ in range(num_messages):
+        current += timedelta(seconds=rng.randint(5, 1800))
+        stamp = _stamp(current, platform, clock)
+        if rng.random() < notification_rate:
+            lines.append(f"{stamp}{rng.choice(USERS)} added {rng.choice(USERS)}\n")
+        else:
+            user = rng.choice(USERS)
+            lines.append(f"{stamp}{user}: {_message(rng, emoji_rate, platform, media_rate, link_rate, multiline_rate)}\n")
+    return ''.join(lines)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+
+import pyarrow.feather as feather
+
+import chat_parser
+
+# bump when the parsed frame layout changes so stale entries are never served
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'whatsapp-chat-analyzer')
+DEFAULT_MAX_BYTES = 1 << 30  # 1 GiB
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8', errors='ignore')
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChatCache:
+    # parsed chats stored as Arrow IPC (feather) files named by the hash of the raw export.
+    # reads memory-map the file: the message column stays Arrow-backed on the mapped pages,
+    # the narrow numeric / categorical columns are copied into pandas. The file mtime doubles
+    # as the last-access time for LRU eviction.
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.v{CACHE_VERSION}.arrow')
+
+    def sidecar_path(self, key, suffix):
+        # files derived from a cached chat (e.g. its search index) sit next to it, count towards
+        # max_bytes with it and are evicted with it. Write them only while `key in cache`
+        return os.path.join(self.directory, f'{key}.v{CACHE_VERSION}.{suffix}')
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def _entries(self):
+        # {stem: [(name, size, mtime)]} of every cached chat: its .arrow file and its sidecars
+        marker = f'.v{CACHE_VERSION}.'
+        entries = {}
+        for name in os.listdir(self.directory):
+            if marker not in name or name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            stem = name[:name.index(marker) + len(marker)]
+            entries.setdefault(stem, []).append((name, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _remove(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def key(self, data, digest=None, **params):
+        suffix = ''.join(f'-{name}={value}' for name, value in sorted(params.items()) if value is not None)
+        return (digest or content_hash(data)) + suffix
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            # converted column by column, each Arrow buffer released once it is in the frame
+            df = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+            os.utime(path)  # mark as recently used
+        except OSError:
+            # missing, or evicted by another session between the read and the utime
+            return None
+        return df
+
+    def put(self, key, df):
+        df = to_storage(df)
+        # write to a temporary file first so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            feather.write_feather(df, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+        return df
+
+    def evict(self):
+        # least recently used chats (by the mtime of their .arrow file) go, sidecars included,
+        # until everything fits in max_bytes; sidecars left without their .arrow go right away
+        chats = []
+        for stem, files in self._entries().items():
+            arrow = [mtime for name, _, mtime in files if name == stem + 'arrow']
+            names = [name for name, _, _ in files]
+            if not arrow:
+                self._remove(names)
+                continue
+            chats.append((arrow[0], sum(size for _, size, _ in files), names))
+
+        total = sum(size for _, size, _ in chats)
+        for _, size, names in sorted(chats):
+            if total <= self.max_bytes:
+                break
+            self._remove(names)
+            total -= size
+
+    def clear(self):
+        for files in self._entries().values():
+            self._remove(name for name, _, _ in files)
+
+    def load_or_parse(self, data, dayfirst=None, digest=None):
+        # data is the raw export (str or bytes); parsing is skipped when it was seen before.
+        # a stream (file object, chunk iterator) can be parsed as it is read when its content
+        # hash is passed as digest, e.g. chat_source.source_hash of the upload
+        key = self.key(data, digest=digest, dayfirst=dayfirst)
+        df = self.get(key)
+        if df is None:
+            df = self.put(key, chat_parser.parse(data, dayfirst=dayfirst))
+            # hand back the stored representation so hits and misses return identical frames
+            stored = self.get(key)
+            if stored is not None:
+                df = stored
+        return df
+
+
+def to_storage(df):
+    # the compact layout maps straight onto Arrow types (dictionary, int8/16, timestamp, string)
+    return chat_parser.compact(df)
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    # location and size can be overridden with CHAT_CACHE_DIR / CHAT_CACHE_MAX_BYTES
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ChatCache(os.environ.get('CHAT_CACHE_DIR', DEFAULT_CACHE_DIR),
+                                   int(os.environ.get('CHAT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+    return _default_cache
+
+
+def load_or_parse(data, dayfirst=None, digest=None):
+    return get_default_cache().load_or_parse(data, dayfirst=dayfirst, digest=digest)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# senders that are not chat participants
+NON_PARTICIPANTS = ('group_notification', 'Meta AI')
+
+
+class ChatIndex:
+    # row positions of each user's messages, grouped once after preprocessing.
+    # a per-user view is a dict lookup plus one take() of that user's rows, materialised
+    # on first use and reused by every helper function after that.
+
+    def __init__(self, df, key=None):
+        self.df = df
+        # names these rows in the shared result cache (content hash, plus the filter for a query);
+        # None keeps every result in this process
+        self.key = key
+        self.positions = df.groupby('user', observed=True, sort=False).indices
+        self._views = {}
+        self._memo = {}
+
+    @property
+    def users(self):
+        return list(self.positions)
+
+    @property
+    def participants(self):
+        return [user for user in self.positions if user not in NON_PARTICIPANTS]
+
+    def count(self, user):
+        if user == 'Overall':
+            return len(self.df)
+        return len(self.positions.get(user, ()))
+
+    def view(self, user):
+        if user == 'Overall':
+            return self.df
+        view = self._views.get(user)
+        if view is None:
+            view = self.df.take(self.positions.get(user, np.empty(0, dtype=np.intp)))
+            self._views[user] = view
+        return view
+
+    def memo(self, key, compute):
+        # results derived from this chat, computed once and shared by every caller
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    @property
+    def _order(self):
+        # row positions in timestamp order; None when the rows already are (the usual case)
+        if '_sorted' not in self._memo:
+            timestamps = self.df['timestamp'].to_numpy()
+            order = None
+            if not self.df['timestamp'].is_monotonic_increasing:
+                order = np.argsort(timestamps, kind='stable')
+                timestamps = timestamps[order]
+            self._memo['_sorted'] = (order, timestamps)
+        return self._memo['_sorted']
+
+    @property
+    def span(self):
+        # (first, last) timestamp of the chat
+        _, timestamps = self._order
+        if not len(timestamps):
+            return None, None
+        return pd.Timestamp(timestamps[0]), pd.Timestamp(timestamps[-1])
+
+    def rows(self, start=None, end=None, users=None):
+        # positions (in frame order) of the messages sent at start <= timestamp < end by any of
+        # users: two binary searches on the sorted timestamps, then each user's own sorted
+        # positions cut to that range, so the cost follows the size of the window
+        order, timestamps = self._order
+        lo = 0 if start is None else int(np.searchsorted(timestamps, pd.Timestamp(start).to_datetime64(), 'left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, pd.Timestamp(end).to_datetime64(), 'left'))
+        hi = max(lo, hi)
+        if order is None:
+            if users is None:
+                return np.arange(lo, hi)
+            parts = [positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+                     for positions in (self.positions.get(user) for user in users) if positions is not None]
+            return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+        rows = order[lo:hi]
+        if users is not None:
+            rows = rows[self.df['user'].take(rows).isin(list(users)).to_numpy()]
+        return np.sort(rows)
+
+    def query(self, start=None, end=None, users=None):
+        # a ChatIndex over just the selected window / users; every helper function takes it in
+        # place of the full chat and aggregates only those rows ('Overall' is the whole selection).
+        # memoised, so widget reruns with the same filter reuse it and everything memoised on it
+        if start is None and end is None and users is None:
+            return self
+        users = None if users is None else tuple(sorted(users))
+        key = ('query', start and pd.Timestamp(start), end and pd.Timestamp(end), users)
+        return self.memo(key, lambda: ChatIndex(self.df.take(self.rows(start, end, users)),
+                                                self.key and f'{self.key}|{key[1:]!r}'))
+
+
+def select(user, df):
+    # helper functions take either a parsed DataFrame or a ChatIndex built from it
+    if isinstance(df, ChatIndex):
+        return df.view(user)
+    if user != 'Overall':
+        df = df[df['user'] == user]
+    return df
+
+
+def frame(df):
+    return df.df if isinstance(df, ChatIndex) else df
+
+
+def query(df, start=None, end=None, users=None):
+    index = df if isinstance(df, ChatIndex) else ChatIndex(df)
+    return index.query(start, end, users)
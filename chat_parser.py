@@ -0,0 +1,355 @@
+import codecs
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import profiling
+
+DEFAULT_BATCH_SIZE = 50_000
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB of raw bytes / characters per read
+MIN_PARALLEL_CHUNK = 4 << 20  # below this a chunk is not worth a worker process
+
+# a message starts on a line beginning with its timestamp, followed by the " - " separator
+# (Android, e.g. "12/31/23, 10:15 PM - Name: text") or in brackets with seconds
+# (iOS, e.g. "[31/12/23, 22:15:07] Name: text", sometimes behind a left-to-right mark).
+# the 12h marker comes in any case and with or without dots: "PM", "pm", "p.m.", "p. m."
+MERIDIEM = r'[AaPp]\.?\s?[Mm]\.?'
+MESSAGE_START = re.compile(r'^\u200e?\[?(\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}(?::\d{2})?\s?(?:' + MERIDIEM + r')?)\]?\s*(?:-\s*)?')
+# sender is everything up to the first ": ", the rest of the text is the message
+USER_MESSAGE = re.compile(r'^([\w\W]+?):\s([\w\W]*)')
+
+# the pieces of a matched timestamp used to pick a concrete strptime format
+TIMESTAMP_PARTS = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{2}|\d{4}),(\s)(\d{1,2}):\d{2}(:\d{2})?(?:(\s?)(' + MERIDIEM + r'))?$')
+# "p.m." / "p. m." / "p m" -> "pm"; %p itself takes AM / PM in any case
+SPLIT_MERIDIEM = r'([AaPp])(?:\.\s?|\s)([Mm])\.?$'
+
+# stored as ordered categoricals so month / weekday groupings sort in calendar order
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _iter_chunks(source, chunk_size):
+    if isinstance(source, (str, bytes, bytearray)):
+        yield source
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        # any iterable of str / bytes chunks (e.g. a streamlit upload read in pieces)
+        yield from source
+
+
+def iter_lines(source, encoding='utf-8-sig', errors='ignore', chunk_size=DEFAULT_CHUNK_SIZE):
+    # yields lines (with their line ending) from a str, bytes, file object or chunk iterator.
+    # bytes are decoded incrementally; utf-8-sig drops the byte-order mark some exports start with,
+    # and text already decoded with plain utf-8 has it dropped here
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    tail = ''
+    started = False
+    for chunk in _iter_chunks(source, chunk_size):
+        if not isinstance(chunk, str):
+            chunk = decoder.decode(chunk)
+        elif not started and chunk.startswith('\ufeff'):
+            chunk = chunk[1:]
+        started = started or bool(chunk)
+        buffer = tail + chunk
+        start = 0
+        while True:
+            end = buffer.find('\n', start)
+            if end < 0:
+                break
+            yield buffer[start:end + 1]
+            start = end + 1
+        tail = buffer[start:]
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class TimestampFormatError(ValueError):
+    pass
+
+
+def _is_chronological(timestamps, date_format):
+    parsed = pd.to_datetime(pd.Series(timestamps, dtype=object), format=date_format, errors='coerce')
+    return parsed.notna().all() and parsed.is_monotonic_increasing
+
+
+def _detect(timestamps, dayfirst=None):
+    # (format, settled): settled is False while every date still reads both ways, and in
+    # time order both ways, so a later batch may yet decide between day-first and month-first
+    firsts, seconds, years, clocks, time_seps = set(), set(), set(), set(), set()
+    date_seps, with_seconds = set(), set()
+    for value in timestamps:
+        match = TIMESTAMP_PARTS.match(value)
+        if match is None:
+            raise TimestampFormatError(f"Unrecognised timestamp {value!r}")
+        first, second, year, date_sep, _, secs, time_sep, meridiem = match.groups()
+        firsts.add(int(first))
+        seconds.add(int(second))
+        years.add(len(year))
+        date_seps.add(date_sep)
+        clocks.add(meridiem is not None)
+        time_seps.add(time_sep)
+        with_seconds.add(secs is not None)
+
+    if not firsts:
+        return None, dayfirst is not None
+    if len(years) > 1 or len(clocks) > 1 or len(date_seps) > 1 or len(time_seps) > 1 or len(with_seconds) > 1:
+        raise TimestampFormatError("Timestamps in this chat use more than one date/time format")
+
+    year = '%y' if years == {2} else '%Y'
+    minutes = '%M:%S' if with_seconds == {True} else '%M'
+    clock = '%I:' + minutes + time_seps.pop() + '%p' if clocks == {True} else '%H:' + minutes
+    day_month, month_day = f'%d/%m/{year},', f'%m/%d/{year},'
+    suffix = date_seps.pop() + clock
+
+    settled = True
+    if dayfirst is None:
+        if max(firsts) > 12 and max(seconds) > 12:
+            raise TimestampFormatError("Cannot tell day from month: both date fields go above 12")
+        if max(firsts) > 12:
+            dayfirst = True
+        elif max(seconds) > 12:
+            dayfirst = False
+        else:
+            # every date fits both ways; exports are chronological, so keep the reading that is.
+            # month-first when both are, as pandas did before
+            timestamps = _plain_meridiem(timestamps)
+            month_first = _is_chronological(timestamps, month_day + suffix)
+            day_first = _is_chronological(timestamps, day_month + suffix)
+            dayfirst = day_first and not month_first
+            settled = day_first != month_first
+
+    return (day_month if dayfirst else month_day) + suffix, settled
+
+
+def detect_format(timestamps, dayfirst=None):
+    # picks one strptime format for the whole export from its raw timestamps:
+    # 2 or 4 digit year, 12h (with or without a (narrow) space before AM/PM) or 24h clock,
+    # with or without seconds, and day-first vs month-first
+    return _detect(timestamps, dayfirst)[0]
+
+
+def _plain_meridiem(timestamps):
+    timestamps = pd.Series(timestamps, dtype=object)
+    if timestamps.str.contains(r'[.\s][Mm]\.?$').any():
+        timestamps = timestamps.str.replace(SPLIT_MERIDIEM, r'\1\2', regex=True)
+    return timestamps
+
+
+def build_frame(timestamps, texts, date_format=None, dayfirst=None, settled=True):
+    # settled (kept in df.attrs['date_settled']) says whether date_format is known to be right
+    # or only the reading that happened to be chronological so far
+    df = pd.DataFrame({'timestamp': pd.Series(timestamps, dtype=object),
+                       'text': pd.Series(texts, dtype=object)})
+
+    df['text'] = df['text'].str.strip()
+    if date_format is None:
+        date_format, settled = _detect(timestamps, dayfirst=dayfirst)
+    df.attrs['date_format'] = date_format
+    df.attrs['date_settled'] = settled
+    if date_format is not None and '%p' in date_format:
+        df['timestamp'] = _plain_meridiem(df['timestamp'])
+    with profiling.stage('parse.datetime', rows=len(df)):
+        try:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format=date_format)
+        except ValueError as error:
+            raise TimestampFormatError(f"Timestamps do not all match the detected format {date_format!r}: {error}") from error
+
+    # "Name: message" -> (Name, message); lines without a sender are group notifications
+    with profiling.stage('parse.user_extraction', rows=len(df)):
+        parts = df['text'].str.extract(USER_MESSAGE)
+        df['user'] = parts[0].fillna('group_notification')
+        df['message'] = parts[1].fillna(df['text'])
+        df.drop(columns=['text'], inplace=True)
+
+    with profiling.stage('parse.date_parts', rows=len(df)):
+        timestamp = df['timestamp'].dt
+        df['year'] = timestamp.year
+        df['month'] = pd.Categorical.from_codes(timestamp.month - 1, categories=MONTHS, ordered=True)
+        df['day'] = timestamp.day
+        df['hour'] = timestamp.hour
+        df['Day_name'] = pd.Categorical.from_codes(timestamp.dayofweek, categories=DAY_NAMES, ordered=True)
+        df["date"] = timestamp.date
+
+    return df
+
+
+def iter_batches(source, batch_size=DEFAULT_BATCH_SIZE, dayfirst=None, date_format=None, **kwargs):
+    # single pass over the export: only the current batch of raw rows is held in memory.
+    # lines without a leading timestamp continue the previous message (multi-line messages),
+    # anything before the first timestamp is dropped.
+    # unless date_format is given, the timestamp format is detected on the first batch and
+    # reused for the rest; each frame records it in df.attrs['date_format']. While every date
+    # so far reads both day-first and month-first, batches are held back until one that
+    # doesn't (or, failing that, the whole export) decides
+    timestamps, texts = [], []
+    held = []
+    settled = True
+    current = None
+    # decoding and splitting into messages is timed per batch, between the yields
+    split_start = time.perf_counter()
+    for line in iter_lines(source, **kwargs):
+        match = MESSAGE_START.match(line)
+        if match is None:
+            if current is not None:
+                current.append(line)
+            continue
+
+        if current is not None:
+            texts.append(''.join(current))
+            if len(texts) == batch_size:
+                profiling.add('parse.split', split_start, time.perf_counter() - split_start, rows=len(texts))
+                if date_format is None:
+                    held.append((timestamps, texts))
+                    detected, settled = _detect(timestamps, dayfirst=dayfirst)
+                    if settled:
+                        date_format = detected
+                        for batch in held:
+                            yield build_frame(*batch, date_format)
+                        held = []
+                else:
+                    yield build_frame(timestamps, texts, date_format)
+                timestamps, texts = [], []
+                split_start = time.perf_counter()
+        timestamps.append(match.group(1).strip())
+        current = [line[match.end():]]
+
+    if current is not None:
+        texts.append(''.join(current))
+    profiling.add('parse.split', split_start, time.perf_counter() - split_start, rows=len(texts))
+    if texts:
+        held.append((timestamps, texts))
+    if held and date_format is None:
+        # never settled: choose on every timestamp of the export
+        date_format, settled = _detect([value for batch, _ in held for value in batch], dayfirst=dayfirst)
+    for batch in held:
+        yield build_frame(*batch, date_format, settled=settled)
+
+
+def parse(source, batch_size=DEFAULT_BATCH_SIZE, dayfirst=None, **kwargs):
+    size = len(source) if isinstance(source, (str, bytes, bytearray)) else None
+    with profiling.stage('parse', bytes=size) as stage:
+        batches = list(iter_batches(source, batch_size=batch_size, dayfirst=dayfirst, **kwargs))
+        if not batches:
+            return build_frame([], [])
+        if len(batches) == 1:
+            df = batches[0]
+        else:
+            with profiling.stage('parse.concat'):
+                df = pd.concat(batches, ignore_index=True)
+            df.attrs = dict(batches[0].attrs)
+        stage.rows = len(df)
+        return df
+
+
+# the narrowest integer types that hold each date part
+COMPACT_INTS = {'year': 'int16', 'day': 'int8', 'hour': 'int8'}
+
+
+def compact(df, arrow_strings=True):
+    # smaller in-memory layout of a parsed frame: categorical senders, narrow date parts,
+    # datetime64 dates instead of datetime.date objects and (optionally) Arrow-backed messages.
+    # column names and values are unchanged, so every helper works on either layout
+    df = df.astype({'user': 'category', **{column: dtype for column, dtype in COMPACT_INTS.items() if column in df}})
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[s]')
+    if arrow_strings:
+        df['message'] = df['message'].astype('string[pyarrow]')
+    return df
+
+
+def memory_report(df, compacted=None):
+    # bytes per column (strings and objects counted in full) before and after compact()
+    if compacted is None:
+        compacted = compact(df)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(deep=True, index=False),
+        'compact dtype': compacted.dtypes.astype(str),
+        'compact bytes': compacted.memory_usage(deep=True, index=False),
+    })
+    report.loc['total'] = ['', report['bytes'].sum(), '', report['compact bytes'].sum()]
+    report['saved'] = 1 - report['compact bytes'] / report['bytes']
+    return report
+
+
+def _next_message_start(data, pos):
+    # offset of the first line at or after pos that starts a message, so no message is split
+    newline = b'\n' if isinstance(data, (bytes, bytearray)) else '\n'
+    if pos == 0:
+        pos = -1
+    else:
+        pos = data.rfind(newline, 0, pos)
+    while True:
+        start = pos + 1
+        head = data[start:start + 64]
+        if not isinstance(head, str):
+            head = head.decode('utf-8', errors='ignore')
+        if start > 0 and MESSAGE_START.match(head):
+            return start
+        pos = data.find(newline, start)
+        if pos < 0:
+            return len(data)
+
+
+def split_chunks(data, num_chunks):
+    # (start, stop) offsets of about num_chunks pieces of data, each beginning with a message
+    size = len(data)
+    bounds = [0]
+    for i in range(1, num_chunks):
+        start = _next_message_start(data, max(bounds[-1] + 1, size * i // num_chunks))
+        if start >= size:
+            break
+        if start > bounds[-1]:
+            bounds.append(start)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _detect_in(data, batch_size, dayfirst=None):
+    # (format, settled) as iter_batches would find them: detected batch by batch until one
+    # decides between day-first and month-first, else on every timestamp
+    timestamps, held = [], []
+    for line in iter_lines(data):
+        match = MESSAGE_START.match(line)
+        if match:
+            timestamps.append(match.group(1).strip())
+            if len(timestamps) == batch_size:
+                date_format, settled = _detect(timestamps, dayfirst=dayfirst)
+                if settled:
+                    return date_format, settled
+                held.extend(timestamps)
+                timestamps = []
+    return _detect(held + timestamps, dayfirst=dayfirst)
+
+
+def _parse_chunk(args):
+    chunk, batch_size, date_format = args
+    return parse(chunk, batch_size=batch_size, date_format=date_format)
+
+
+def parse_parallel(data, workers=None, batch_size=DEFAULT_BATCH_SIZE, dayfirst=None, chunks_per_worker=4):
+    # data is the whole export as str or bytes. It is cut at message starts into chunks that
+    # are parsed in a process pool and concatenated in order, giving the same frame as parse()
+    workers = workers or os.cpu_count() or 1
+    num_chunks = min(workers * chunks_per_worker, len(data) // MIN_PARALLEL_CHUNK)
+    if workers <= 1 or num_chunks <= 1:
+        return parse(data, batch_size=batch_size, dayfirst=dayfirst)
+
+    # detect the format on the same batches the serial parser would use
+    date_format, settled = _detect_in(data, batch_size, dayfirst=dayfirst)
+    chunks = ((data[start:stop], batch_size, date_format) for start, stop in split_chunks(data, num_chunks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = [df for df in pool.map(_parse_chunk, chunks) if not df.empty]
+    if not frames:
+        return parse(data[:0], batch_size=batch_size, dayfirst=dayfirst)
+    df = pd.concat(frames, ignore_index=True)
+    df.attrs.update(date_format=date_format, date_settled=settled)
+    return df
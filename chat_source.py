@@ -0,0 +1,65 @@
+import fnmatch
+import hashlib
+import os
+import zipfile
+from contextlib import contextmanager
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# WhatsApp names the chat inside an export "_chat.txt" (iOS) or "WhatsApp Chat with <name>.txt"
+# (Android, localised e.g. "Chat de WhatsApp con ..."); tried in this order before falling back
+# to the largest .txt member. Matched case-insensitively against the member's base name.
+CHAT_FILE_PATTERNS = ('_chat.txt', 'whatsapp chat with *.txt', 'whatsapp chat - *.txt', '*whatsapp*.txt')
+
+
+class NoChatFileError(ValueError):
+    pass
+
+
+def _is_candidate(info):
+    name = info.filename
+    return (not info.is_dir() and name.lower().endswith('.txt')
+            and not name.startswith('__MACOSX/') and not os.path.basename(name).startswith('._'))
+
+
+def pick_chat_member(archive):
+    # the ZipInfo of the chat transcript in a WhatsApp export
+    candidates = [info for info in archive.infolist() if _is_candidate(info)]
+    for pattern in CHAT_FILE_PATTERNS:
+        matches = [info for info in candidates if fnmatch.fnmatch(os.path.basename(info.filename).lower(), pattern)]
+        if matches:
+            return max(matches, key=lambda info: info.file_size)
+    if not candidates:
+        raise NoChatFileError("No WhatsApp chat text file found in the ZIP.")
+    return max(candidates, key=lambda info: info.file_size)
+
+
+def source_hash(file):
+    # content hash of an uploaded file, read in chunks so no second full copy is made
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def is_zip(file):
+    file.seek(0)
+    magic = file.read(4)
+    file.seek(0)
+    return magic == b'PK\x03\x04'
+
+
+@contextmanager
+def open_chat(file):
+    # binary stream of the chat transcript in an uploaded .txt or .zip export.
+    # a ZIP member is decompressed as it is read, so chat_parser can decode and parse it chunk
+    # by chunk without the whole transcript (or a decoded copy of it) ever being in memory
+    if not is_zip(file):
+        file.seek(0)
+        yield file
+        return
+    with zipfile.ZipFile(file) as archive:
+        with archive.open(pick_chat_member(archive)) as member:
+            yield member
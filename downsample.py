@@ -0,0 +1,74 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import rollup
+
+# fewer points for long time series before they are plotted: Largest-Triangle-Three-Buckets keeps
+# the points that shape the line (spikes and dips survive), bucketing sums the series per week /
+# month / year instead.
+
+METHODS = ('lttb', 'buckets')
+
+
+def _numeric(values):
+    # numbers as they are, dates as nanoseconds, anything else (e.g. '2024-Jan' labels) by position
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    if pd.api.types.is_datetime64_any_dtype(values) or (len(values) and isinstance(values.iloc[0], datetime.date)):
+        return pd.to_datetime(values).astype('datetime64[ns]').to_numpy().astype(np.int64).astype(np.float64)
+    return np.arange(len(values), dtype=np.float64)
+
+
+def lttb(x, y, num_points):
+    # positions of the num_points points kept: the first and the last, and from each bucket in
+    # between the one spanning the largest triangle with the point kept before it and the mean
+    # of the next bucket
+    n = len(y)
+    if num_points >= n or num_points < 3:
+        return np.arange(n)
+    x, y = _numeric(x), _numeric(y)
+    bounds = (np.arange(num_points - 1) * (n - 2) / (num_points - 2)).astype(np.intp) + 1
+    sizes = np.diff(bounds)
+    means_x = np.add.reduceat(x[:-1], bounds[:-1]) / sizes
+    means_y = np.add.reduceat(y[:-1], bounds[:-1]) / sizes
+    means_x = np.append(means_x[1:], x[-1])  # the last bucket looks ahead to the last point
+    means_y = np.append(means_y[1:], y[-1])
+
+    kept = np.empty(num_points, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(num_points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - means_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (means_y[i] - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def buckets(df, x, y, max_points):
+    # y summed per the finest of week / month / year that fits in max_points; periods without
+    # any rows count as 0 and are labelled by their first day. The frequency used is in .attrs['freq']
+    dates = pd.to_datetime(df[x])
+    series = pd.Series(df[y].to_numpy(), index=pd.DatetimeIndex(dates))
+    for freq in ('week', 'month', 'year'):
+        totals = series.resample(rollup.FREQUENCIES[freq], label='left', closed='left').sum()
+        if len(totals) <= max_points:
+            break
+    result = pd.DataFrame({x: totals.index, y: totals.to_numpy()})
+    result.attrs['freq'] = freq
+    return result
+
+
+def downsample(df, x, y, max_points, method='lttb'):
+    # df itself when it already fits in max_points, else a smaller frame of (x, y); rows are
+    # expected in x order, as every timeline is
+    if len(df) <= max_points:
+        return df
+    if method == 'buckets':
+        return buckets(df, x, y, max_points)
+    if method != 'lttb':
+        raise ValueError(f"Unknown downsampling method {method!r}, expected one of {METHODS}")
+    return df.iloc[lttb(df[x], df[y], max_points)].reset_index(drop=True)
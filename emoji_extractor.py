@@ -0,0 +1,93 @@
+import re
+from functools import lru_cache
+
+import emoji
+import numpy as np
+import pandas as pd
+
+
+CANDIDATE = '[\u00a9-\U0010FFFF]'
+# keycap emoji are the only ones starting below U+00A9: '#', '*' or a digit, then U+FE0F / U+20E3
+KEYCAP_FIRSTS = np.array([ord(char) for char in '#*0123456789'], dtype=np.uint32)
+
+
+def _trie_pattern(node):
+    # regex for a character trie: shared prefixes are matched once, and optional longer
+    # continuations make the (greedy) match the longest emoji at each position
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+@lru_cache(maxsize=None)
+def emoji_pattern():
+    # one compiled pattern over every sequence in emoji.EMOJI_DATA, so ZWJ sequences
+    # (families, professions), skin tones and flags count as a single emoji
+    trie = {}
+    for sequence in emoji.EMOJI_DATA:
+        node = trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    # re tries the top-level branches one by one at every position; a cheap character class
+    # lookahead first skips plain text (keycap emoji start with '#', '*' or a digit)
+    ascii_firsts = ''.join(re.escape(char) for char in sorted(trie) if char and ord(char) < 0x80)
+    lowest = min(char for char in trie if char and ord(char) >= 0x80)
+    prefilter = f'(?=[{ascii_firsts}{re.escape(lowest)}-\U0010FFFF])'
+    return re.compile(prefilter + _trie_pattern(trie))
+
+
+@lru_cache(maxsize=None)
+def _emoji_run_pattern():
+    # no lookahead here: pyarrow-backed strings run fullmatch through RE2, which lacks it
+    return re.compile('(?:' + emoji_pattern().pattern.split(')', 1)[1] + ')+')
+
+
+def _candidate_runs(messages):
+    # every run of characters >= U+00A9 (and the keycap start before one), indexed by its
+    # message; found over the code points of all messages at once instead of a regex per message
+    text = '\n'.join(messages.tolist())
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    candidate = codes >= 0xa9
+    candidate[:-1] |= np.isin(codes[:-1], KEYCAP_FIRSTS) & candidate[1:]
+    edges = np.flatnonzero(np.diff(candidate, prepend=False, append=False))
+    starts, ends = edges[::2], edges[1::2]
+    # the newline joining two messages is never part of a run
+    owners = np.searchsorted(np.cumsum(messages.str.len().to_numpy() + 1), starts, side='right')
+    return pd.Series([text[start:end] for start, end in zip(starts.tolist(), ends.tolist())],
+                     index=messages.index[owners], dtype=object)
+
+
+def extract(messages):
+    # one row per emoji occurrence, indexed by the message it came from.
+    # every emoji sequence has a code point >= U+00A9, so plain-ASCII messages are dropped
+    # with one vectorized contains(); the rest are cut into runs of such characters, and the
+    # (much slower) trie findall only goes over each distinct run once
+    messages = messages.astype(str)
+    runs = _candidate_runs(messages[messages.str.contains(CANDIDATE)])
+    codes, uniques = pd.factorize(runs)
+    found = pd.Series(uniques, dtype=object).str.findall(emoji_pattern())
+    lengths = found.str.len().to_numpy(dtype=np.int64)
+    emojis = np.array([e for sequence in found for e in sequence], dtype=object)
+    # emojis[starts[code]:starts[code] + lengths[code]] are the emoji of a run, repeated for
+    # every time the run occurs
+    starts = np.cumsum(lengths) - lengths
+    per_run = lengths[codes]
+    run = np.repeat(np.arange(len(codes)), per_run)
+    offset = np.arange(per_run.sum()) - np.repeat(np.cumsum(per_run) - per_run, per_run)
+    return pd.Series(emojis[starts[codes][run] + offset], index=runs.index[run], dtype=object)
+
+
+def emoji_counts(df):
+    # occurrences per (user, emoji) for every user in one pass
+    found = extract(df['message'])
+    users = df['user'].astype(str).loc[found.index]
+    return pd.DataFrame({'user': users, 'emoji': found}).groupby(['user', 'emoji']).size()
+
+
+def is_emoji_only(tokens):
+    return tokens.astype(str).str.fullmatch(_emoji_run_pattern())
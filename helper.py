@@ -1,217 +1,191 @@
 import pandas as pd
-import re
 from wordcloud import WordCloud
-import emoji
 from collections import Counter
-import re
-import string
+from functools import lru_cache
+import io
 import numpy as np
 from PIL import Image, ImageDraw
 
+import chat_parser
+import emoji_extractor
+import links
+import profiling
+import response_time
+import rollup
+import sketches
+import tokenizer
+from chat_index import ChatIndex, frame, select
+
+MEDIA_OMITTED = tokenizer.MEDIA_OMITTED
+
+
+@profiling.timed()
+def preprocess(chat, batch_size=chat_parser.DEFAULT_BATCH_SIZE, dayfirst=None, workers=1, compact=False):
+    # chat can be the decoded text, raw bytes, a file object or an iterator of chunks.
+    # dayfirst=None detects DD/MM vs MM/DD from the data, raises TimestampFormatError if it can't.
+    # workers > 1 (or None for every core) parses a str / bytes export in a process pool.
+    # compact=True returns the smaller layout from chat_parser.compact (see memory_report)
+    if workers != 1 and isinstance(chat, (str, bytes)):
+        df = chat_parser.parse_parallel(chat, workers=workers, batch_size=batch_size, dayfirst=dayfirst)
+    else:
+        df = chat_parser.parse(chat, batch_size=batch_size, dayfirst=dayfirst)
+    return chat_parser.compact(df) if compact else df
 
-def preprocess(chat):
-    pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s?[APM\u202F]*'
-    date = re.findall(pattern, chat)
-    text = re.split(pattern, chat)[1:]
-    text = [re.sub(r'\s*-\s*', '', x) for x in text]
-    df = pd.DataFrame({'timestamp': date, 'text': text})
-
-    df['text'] = df['text'].str.strip()
-    df['timestamp'] = pd.to_datetime(df['timestamp'], format='mixed')
-
-    name, message = [], []
-    for i in df['text']:
-        match = re.match(r'([\w\W]+?):\s', i)
-        if match:
-            name.append(match.group(1))
-            message.append(i[len(match.group(0)):])
-        else:
-            name.append('group_notification')
-            message.append(i)
-
-    df['user'] = name
-    df['message'] = message
-    df.drop(columns=['text'], inplace=True)
-
-    df['year'] = df['timestamp'].dt.year
-    df['month'] = df['timestamp'].dt.strftime('%b')
-    df['day'] = df['timestamp'].dt.day
-    df['hour'] = df['timestamp'].dt.hour
-    df['Day_name'] = df['timestamp'].dt.day_name()
-    df["date"] = df["timestamp"].dt.date
-
-    return df
+@profiling.timed()
+def memory_report(df):
+    return chat_parser.memory_report(frame(df))
 
+@profiling.timed()
 def calculate_stats(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
+    # (messages, words, media, links)
+    return rollup.for_chat(df, user).totals(user)
 
-    num_messages = df.shape[0]
-    media_len = df[df['message'] == '<Media omitted>\n'].shape[0]
-    df['message'] = df['message'].astype(str)
-    word_count = sum(df['message'].str.split().str.len())
-    link_count = df['message'].str.contains("http").sum()
-    return num_messages, word_count, media_len, link_count
-
-def daily_activity(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-    return df.groupby(df['date'])['message'].count().reset_index()
+@profiling.timed()
+def daily_activity(user, df, freq='day'):
+    # freq: 'day', 'week', 'month' or 'year'; reductions of the chat's rollup cube (rollup.py)
+    return rollup.for_chat(df, user).timeline(user, freq)
 
+@profiling.timed()
 def weekly_activity_heatmap(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-    heatmap_data = df.groupby(['Day_name', 'hour'])['message'].count().unstack().fillna(0)
-    return heatmap_data
+    return rollup.for_chat(df, user).heatmap(user)
 
+@profiling.timed()
 def hourly_distribution(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-    return df.groupby('hour')['message'].count()
+    return rollup.for_chat(df, user).hourly(user)
 
 # cleaning like removing url, punctuation, stopwords, group notification, medias
-def cleaned_message(df):
-    with open(r"stopwords_hindi-english-telugu.txt", 'r') as file:
-        stopwords = file.read()
-
-    temp_df = df[df['user'] != 'group_notification']
-    temp_df = temp_df[temp_df['message'] != '<Media omitted>']
-    temp_df = temp_df[temp_df['message'] != 'This message was deleted']
-    temp_df = temp_df[~temp_df['message'].str.strip().isin(['null', 'null\n', ''])]
-
-    # remove urls and punctuation
-
-    def remove_extras(text):
-        text = re.sub(r'http[s]?://\S+', '', text)  # Remove URLs
-        text = re.sub(r'[@]?\d{10,}', '', text)  # Remove numbers like @1234567890
-        text = re.sub(r'<.*?>', '', text)  # Remove HTML tags
-        text = re.sub(r'\S+@\S+\.\S+', '', text) #remove emails
-        tokens = text.split()  # Tokenize text (split into words)
-
-        tokens = [word for word in tokens if word not in string.punctuation]  # Remove punctuation
-        tokens = [word for word in tokens if word.lower() not in stopwords]  # Remove stopwords
-
-        cleaned_text = " ".join(tokens)  # Reconstruct text
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()  # Normalize spaces
-
-        return cleaned_text
-
-    temp_df['message'] = temp_df['message'].apply(remove_extras)
-
-    words = []
-    for message in temp_df['message']:
-        for word in message.lower().split():
-            if word not in stopwords:
-                words.append(word)
-    return words
-
-def most_common_words(user, df):
+# stopwords: a tokenizer.STOPWORD_FILES key ('hindi-english-telugu', 'hinglish') or a file path
+@profiling.timed()
+def cleaned_message(df, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    return tokenizer.corpus(frame(df), stopwords).tolist()
+
+def chat_sketches(df, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    # per-user word / emoji sketches of the chat (see sketches.py), memoised on a ChatIndex
+    if isinstance(df, ChatIndex):
+        return df.memo(('sketches', stopwords), lambda: sketches.sketch_frame(df.df, stopwords=stopwords))
+    return sketches.sketch_frame(df, stopwords=stopwords)
+
+def chat_word_counts(df, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    # occurrences per (user, word) of the chat, memoised on a ChatIndex
+    if isinstance(df, ChatIndex):
+        return df.memo(('word_counts', stopwords), lambda: tokenizer.word_counts(df.df, stopwords))
+    return tokenizer.word_counts(df, stopwords)
+
+def chat_emoji_counts(df):
+    # occurrences per (user, emoji) of the chat, memoised on a ChatIndex
+    if isinstance(df, ChatIndex):
+        return df.memo('emoji_counts', lambda: emoji_extractor.emoji_counts(df.df))
+    return emoji_extractor.emoji_counts(df)
+
+def top_counts(counts, user, top):
+    # (item, count) pairs of one user's (or everyone's) counts, most frequent first
     if user != 'Overall':
-        df = df[df['user'] == user]
-    words = cleaned_message(df)
-    words=[word for word in words if word not in emoji.EMOJI_DATA]
+        counts = counts[counts.index.get_level_values(0) == user]
+    totals = counts.groupby(level=1).sum().sort_values(ascending=False, kind='stable')
+    return pd.DataFrame(list(totals.head(top).items()))
+
+# words: a precomputed cleaned_message list, so several views can share one tokenized corpus.
+# approximate=True counts through bounded-memory sketches instead of the full token list
+@profiling.timed()
+def most_common_words(user, df, words=None, stopwords=tokenizer.DEFAULT_STOPWORDS, approximate=False):
+    if approximate and words is None:
+        return chat_sketches(df if isinstance(df, ChatIndex) else select(user, df), stopwords).words(user)
+    if words is None:
+        return top_counts(chat_word_counts(df if isinstance(df, ChatIndex) else select(user, df), stopwords), user, 20)
+    words = pd.Series(words, dtype=object)
+    words = words[~emoji_extractor.is_emoji_only(words)]
     word_df=pd.DataFrame(Counter(words).most_common(20))
     return word_df
 
-def create_wordcloud(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-    words=cleaned_message(df)
+WORDCLOUD_SIZE = (600, 450)
+WORDCLOUD_MAX_WORDS = 150
 
-    mask_size = (600, 450)  # Define the size of the word cloud
-    mask = Image.new("L", mask_size, 255)  # Create a white canvas
+@lru_cache(maxsize=8)
+def wordcloud_mask(width, height):
+    # built once per size and shared by every render
+    mask = Image.new("L", (width, height), 255)  # Create a white canvas
     draw = ImageDraw.Draw(mask)
-    draw.ellipse((20, 20, 600, 450), fill=0)  # Draw an ellipse (adjust for best shape)
-    mask = np.array(mask)
-
-    wc = WordCloud(min_font_size=7,width=600, height=450,mode='RGBA', background_color='black',mask=mask,max_words=150).generate(" ".join(words))
+    draw.ellipse((20, 20, width, height), fill=0)  # Draw an ellipse (adjust for best shape)
+    return np.array(mask)
+
+@profiling.timed()
+def create_wordcloud(user, df, words=None, stopwords=tokenizer.DEFAULT_STOPWORDS, max_words=WORDCLOUD_MAX_WORDS):
+    if words is None:
+        words = cleaned_message(select(user, df), stopwords)
+
+    # lay out only the max_words most frequent words, instead of handing WordCloud the whole
+    # corpus as one string to tokenize again; layout cost no longer grows with the chat
+    frequencies = dict(Counter(words).most_common(max_words))
+    width, height = WORDCLOUD_SIZE
+    with profiling.stage('wordcloud.layout', rows=len(frequencies)):
+        wc = WordCloud(min_font_size=7,width=width, height=height,mode='RGBA', background_color='black',
+                       mask=wordcloud_mask(width, height),max_words=max_words).generate_from_frequencies(frequencies)
     return wc
 
-def emoji_counter(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-    emojis = [c for message in df['message'] for c in message if c in emoji.EMOJI_DATA]
-    return pd.DataFrame(Counter(emojis).most_common(10))
-
+@profiling.timed()
+def wordcloud_png(user, df, stopwords=tokenizer.DEFAULT_STOPWORDS, max_words=WORDCLOUD_MAX_WORDS):
+    # rendered PNG bytes kept in memory (memoised per user and parameters on a ChatIndex),
+    # or None when there are no words to draw
+    def render():
+        words = cleaned_message(select(user, df), stopwords)
+        if not words:
+            return None
+        wc = create_wordcloud(user, df, words, max_words=max_words)
+        with profiling.stage('wordcloud.encode') as stage:
+            buffer = io.BytesIO()
+            wc.to_image().save(buffer, format="PNG")
+            stage.bytes = buffer.tell()
+        return buffer.getvalue()
+
+    if isinstance(df, ChatIndex):
+        return df.memo(('wordcloud', user, stopwords, max_words), render)
+    return render()
+
+@profiling.timed()
+def emoji_counter(user, df, approximate=False):
+    if approximate:
+        return chat_sketches(df if isinstance(df, ChatIndex) else select(user, df)).emojis(user)
+    return top_counts(chat_emoji_counts(df if isinstance(df, ChatIndex) else select(user, df)), user, 10)
+
+@profiling.timed()
 def monthly_timeline(user, df):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-
-    # Group messages by year and month
-    temp = df.groupby(['year', 'month']).size().reset_index(name='message')  # Ensure 'message' column exists
-
-    # Create 'time' column in YYYY-MMM format (e.g., "2024-Jan")
-    temp['time'] = temp['year'].astype(str) + "-" + temp['month'].astype(str)
-
-    return temp
+    # year, month, message and a 'time' column in YYYY-MMM format (e.g. "2024-Jan"), in calendar order
+    return rollup.for_chat(df, user).monthly(user)
 
 
+@profiling.timed()
 def most_active_user(df):
-    users=list(df['user'].unique())
-    if any(users[users=='group_notification']):
-        users.remove('group_notification')
-    elif any(users[users=='Meta AI']):
-        users.remove('Meta AI')
-    else:
-        pass
-    names=[]
-    counts=[]
-    for user in users:
-        count=len(df[df['user']==user])
-        names.append(user)
-        counts.append(count)
+    if not isinstance(df, ChatIndex):
+        df = ChatIndex(df)
+    names = df.participants
+    counts = [df.count(user) for user in names]
     return {'names':names,'counts':counts}
 
 
-def calculate_response_time(df):
-    df = df[df["user"] != "group_notification"]
-    df = df[df["user"] != "Meta AI"]
-
-    df = df.sort_values("timestamp")
-    df["prev_user"] = df["user"].shift(1)
-    df["prev_timestamp"] = df["timestamp"].shift(1)
-
-    # Compute Response Time (only when user changes and same-day chat)
-    df["Response time (minutes)"] = (df["timestamp"] - df["prev_timestamp"]).dt.total_seconds() / 60  # Convert to minutes
-
-    # Ignore consecutive messages from the same user
-    df.loc[df["user"] == df["prev_user"], "Response time (minutes)"] = None
-
-    df.loc[df["Response time (minutes)"] > 240, "Response time (minutes)"] = None
-
-    # Drop columns
-    df.drop(columns=["prev_user", "prev_timestamp"], inplace=True)
-    df['Response time (minutes)'] = df['Response time (minutes)'].fillna(0)
-    return df
+# one row per reply (a message following someone else's within cutoff_minutes) with its gap;
+# messages that are not replies are left out instead of being counted as 0
+@profiling.timed()
+def calculate_response_time(df, cutoff_minutes=response_time.DEFAULT_CUTOFF_MINUTES):
+    return response_time.analyze(df, cutoff_minutes).responses
 
 # Calculate average response time per user
-def average_response_time_user(df):
-    df=calculate_response_time(df)
-    avg_response_time = df.groupby("user")["Response time (minutes)"].mean().dropna().reset_index()
+# response_times: output of calculate_response_time, to reuse one computation across tables
+@profiling.timed()
+def average_response_time_user(df, response_times=None):
+    df = calculate_response_time(df) if response_times is None else response_times
+    avg_response_time = df.groupby("user", observed=True)["Response time (minutes)"].mean().dropna().reset_index()
     avg_response_time.columns = ["User", "Avg Response Time (minutes)"]
     return avg_response_time
 
 
-def day_wise_response_time(df):
-    df = calculate_response_time(df)
-    day_wise_response = df.groupby("Day_name")["Response time (minutes)"].mean().reset_index()
+@profiling.timed()
+def day_wise_response_time(df, response_times=None):
+    df = calculate_response_time(df) if response_times is None else response_times
+    day_wise_response = df.groupby("Day_name", observed=True)["Response time (minutes)"].mean().reset_index()
 
     return day_wise_response
 
 
+@profiling.timed()
 def find_links(df, user):
-    if user != 'Overall':
-        df = df[df['user'] == user]
-
-    links = []
-    dates = []
-
-    for _, row in df.iterrows():
-        message = row['message']
-        link_list = re.findall(r'http[s]?://\S+', message)  # Extract links
-
-        for link in link_list:  # Ensure each link gets a corresponding date entry
-            dates.append(row['date'])
-            links.append(link)
-
-    return pd.DataFrame({"Date": dates, "Links": links})
\ No newline at end of file
+    return links.user_links(df, user)[['Date', 'Links']].reset_index(drop=True)
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+import chat_cache
+import chat_parser
+import emoji_extractor
+import rollup
+import tokenizer
+from chat_index import ChatIndex
+
+# a chat is recognised by the hash of the first line of its export (at most PREFIX_BYTES),
+# which does not change when the same group is exported again with newer messages appended
+PREFIX_BYTES = 4096
+STATE_VERSION = 3
+DEFAULT_STORE_DIR = os.path.join(chat_cache.DEFAULT_CACHE_DIR, 'chats')
+
+
+def fingerprint(data):
+    end = data.find(b'\n', 0, PREFIX_BYTES)
+    return hashlib.sha256(data[:end if end >= 0 else PREFIX_BYTES]).hexdigest()
+
+
+def last_message_offset(data):
+    # byte offset of the line that starts the last message
+    end = len(data)
+    while end > 0:
+        start = data.rfind(b'\n', 0, end - 1) + 1
+        line = data[start:end].decode('utf-8', errors='ignore')
+        if chat_parser.MESSAGE_START.match(line):
+            return start
+        end = start
+    return 0
+
+
+def aggregate(df):
+    # the rollup cube and per-(user, word) / (user, emoji) counts of the rows in df; all of
+    # them add up, so they are kept across ingests instead of recomputed from every row
+    cube = rollup.Rollup.build(df)
+    for metric in rollup.METRICS:
+        cube.cube(metric)  # filled in while the rows are at hand
+    return {'rollup': cube,
+            'word_counts': tokenizer.word_counts(df),
+            'emoji_counts': emoji_extractor.emoji_counts(df)}
+
+
+def _add_counts(counts, other, sign=1):
+    counts = counts.add(sign * other, fill_value=0).astype('int64')
+    return counts[counts != 0]
+
+
+def merge(aggregates, other, sign=1):
+    aggregates['rollup'].merge(other['rollup'], sign)
+    for name in ('word_counts', 'emoji_counts'):
+        aggregates[name] = _add_counts(aggregates[name], other[name], sign)
+    return aggregates
+
+
+class IngestedChat:
+    # a parsed chat with the aggregates kept up to date across incremental ingests
+
+    def __init__(self, df, state, status):
+        self.df = df
+        self.df.attrs['date_format'] = state['date_format']
+        self.state = state
+        self.status = status  # 'new', 'appended' or 'unchanged'
+
+    def index(self, key=None):
+        # a ChatIndex that starts from the stored aggregates: every helper function reading the
+        # rollup or the word / emoji counts (helper.calculate_stats, daily_activity,
+        # most_common_words, emoji_counter, ...) uses them instead of going over the rows
+        index = ChatIndex(self.df, key)
+        aggregates = self.state['aggregates']
+        aggregates['rollup'].date_dtype = self.df['date'].dtype
+        index.memo('rollup', lambda: aggregates['rollup'])
+        index.memo(('word_counts', tokenizer.DEFAULT_STOPWORDS), lambda: aggregates['word_counts'])
+        index.memo('emoji_counts', lambda: aggregates['emoji_counts'])
+        return index
+
+
+class ChatStore:
+    # parsed frames live in a ChatCache keyed by the chat fingerprint; the ingest state
+    # (consumed prefix hash, last message, date format, aggregates) is a sidecar of the frame,
+    # evicted with it
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_bytes=chat_cache.DEFAULT_MAX_BYTES):
+        self.frames = chat_cache.ChatCache(directory, max_bytes)
+
+    def _state_path(self, key):
+        return self.frames.sidecar_path(key, f'state{STATE_VERSION}')
+
+    def _load(self, key):
+        df = self.frames.get(key)
+        if df is None:
+            return None, None
+        try:
+            with open(self._state_path(key), 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None, None
+        # a frame and state written by two ingests of the same chat at once don't belong together
+        if state['rows'] != len(df):
+            return None, None
+        return df, state
+
+    def _save(self, key, df, state):
+        # the frame first: a state is only ever read next to the frame it was written for
+        df = self.frames.put(key, df)
+        state['rows'] = len(df)
+        if key not in self.frames:
+            # evicted straight away (larger than the store); keep nothing next to it
+            return df
+        fd, tmp_path = tempfile.mkstemp(dir=self.frames.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._state_path(key))
+        stored = self.frames.get(key)
+        return df if stored is None else stored
+
+    def ingest(self, data, dayfirst=None):
+        # data: the full export (str or bytes). When the start of the export matches a stored
+        # chat and everything up to its last message is unchanged, only the new tail is parsed
+        if isinstance(data, str):
+            data = data.encode('utf-8', errors='ignore')
+        key = fingerprint(data)
+        df, state = self._load(key)
+
+        if df is not None:
+            boundary = state['boundary']
+            if (len(data) >= boundary
+                    and hashlib.sha256(data[:boundary]).hexdigest() == state['prefix_hash']
+                    and data[boundary:].startswith(state['last_line'])):
+                if len(data) == state['length']:
+                    return IngestedChat(df, state, 'unchanged')
+                # a date format picked only because the dates so far read chronologically that
+                # way may be wrong once later days arrive, so such chats are parsed again in
+                # full, as are tails that don't fit the stored format
+                if state['settled']:
+                    try:
+                        return self._append(key, data, df, state)
+                    except chat_parser.TimestampFormatError:
+                        pass
+
+        df = chat_parser.parse(data, dayfirst=dayfirst)
+        state = {'date_format': df.attrs.get('date_format'), 'settled': df.attrs.get('date_settled', True),
+                 'aggregates': aggregate(df)}
+        return IngestedChat(self._save(key, df, self._mark(state, data)), state, 'new')
+
+    def _append(self, key, data, df, state):
+        # the stored last message is parsed again with the tail, in case the earlier export
+        # cut it short; its counts are taken back out before the tail's are added
+        tail = chat_parser.parse(data[state['boundary']:], date_format=state['date_format'])
+        # the tail parsed, so the stored aggregates are only touched from here on
+        merge(state['aggregates'], aggregate(df.iloc[-1:]), sign=-1)
+        merge(state['aggregates'], aggregate(tail))
+
+        df = pd.concat([df.iloc[:-1].astype({'user': object}), tail], ignore_index=True)
+        return IngestedChat(self._save(key, df, self._mark(state, data)), state, 'appended')
+
+    @staticmethod
+    def _mark(state, data):
+        boundary = last_message_offset(data)
+        state['boundary'] = boundary
+        state['prefix_hash'] = hashlib.sha256(data[:boundary]).hexdigest()
+        state['last_line'] = data[boundary:data.find(b'\n', boundary) + 1 or len(data)]
+        state['length'] = len(data)
+        return state
+
+
+_default_store = None
+
+
+def get_default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = ChatStore(os.environ.get('CHAT_STORE_DIR', DEFAULT_STORE_DIR))
+    return _default_store
+
+
+def ingest(data, dayfirst=None):
+    return get_default_store().ingest(data, dayfirst=dayfirst)
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from chat_index import ChatIndex, select
+
+# the one rule for what counts as a shared link, used by every count and table
+URL_PATTERN = r'(?P<Links>http[s]?://\S+)'
+DOMAIN_PATTERN = r'^http[s]?://(?:www\.)?([^/?#:]+)'
+
+
+def link_table(df):
+    # every link in the chat with its message's row, date and sender, plus the lower-cased domain.
+    # with a ChatIndex the table is built once and per-user tables are slices of it
+    if isinstance(df, ChatIndex):
+        return df.memo('links', lambda: link_table(df.df))
+
+    found = df['message'].astype(str).str.extractall(URL_PATTERN)['Links']
+    rows = found.index.get_level_values(0)
+    table = pd.DataFrame({
+        'Date': df['date'].loc[rows].to_numpy(),
+        'user': df['user'].astype(str).loc[rows].to_numpy(),
+        'Links': found.to_numpy(),
+    }, index=rows)
+    table['domain'] = table['Links'].str.extract(DOMAIN_PATTERN, expand=False).str.lower()
+    return table
+
+
+def user_links(df, user):
+    if not isinstance(df, ChatIndex):
+        return link_table(select(user, df))
+    table = link_table(df)
+    if user != 'Overall':
+        table = table[table['user'] == user]
+    return table
+
+
+def domain_summary(table):
+    # links per domain, most shared first, with how many of them each user posted
+    per_user = table.groupby(['domain', 'user']).size().unstack(fill_value=0)
+    summary = per_user.sum(axis=1).rename('Links').to_frame().join(per_user)
+    return summary.sort_values('Links', ascending=False).reset_index().rename(columns={'domain': 'Domain'})
@@ -0,0 +1,38 @@
+import plotly.express as px
+
+import downsample
+
+# line charts that stay light in the browser however long the chat: at most MAX_POINTS points
+# and MAX_PAYLOAD_BYTES of figure JSON, WebGL (Scattergl) instead of SVG for long series, and the
+# costly spline smoothing and per-point markers only on short ones.
+
+MAX_POINTS = 2000
+MAX_PAYLOAD_BYTES = 1_000_000
+MIN_POINTS = 100  # the byte cap never halves a series below this
+WEBGL_POINTS = 1000
+SMOOTH_POINTS = 400
+BYTES_PER_POINT = 100  # generous upper bound for a (date, count) point; below it the JSON isn't measured
+
+
+def payload_bytes(fig):
+    # roughly what st.plotly_chart sends to the browser
+    return len(fig.to_json())
+
+
+def line_chart(df, x, y, title, max_points=MAX_POINTS, max_bytes=MAX_PAYLOAD_BYTES, method='lttb', **kwargs):
+    # px.line over df, downsampled (downsample.METHODS) until it fits max_points and max_bytes;
+    # the title says when not every point is shown. kwargs go to px.line
+    points = max_points
+    while True:
+        shown = downsample.downsample(df, x, y, points, method)
+        smooth = len(shown) <= SMOOTH_POINTS
+        fig = px.line(shown, x=x, y=y, title=title, markers=smooth, line_shape='spline' if smooth else 'linear',
+                      render_mode='webgl' if len(shown) > WEBGL_POINTS else 'svg', **kwargs)
+        if len(shown) <= MIN_POINTS or len(shown) * BYTES_PER_POINT <= max_bytes or payload_bytes(fig) <= max_bytes:
+            break
+        points = max(len(shown) // 2, MIN_POINTS)
+    if 'freq' in shown.attrs:
+        fig.update_layout(title_text=f"{title} (totals per {shown.attrs['freq']})")
+    elif len(shown) < len(df):
+        fig.update_layout(title_text=f"{title} ({len(shown):,} of {len(df):,} points)")
+    return fig
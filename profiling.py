@@ -0,0 +1,180 @@
+import contextvars
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# opt-in stage timing for the parser, helper functions and the app.
+# nothing is recorded unless a Profiler is active in the current context (see record / activate,
+# or set CHAT_PROFILE=1 to record everything into a process-wide profiler); with none active,
+# stage() is a dict lookup and a no-op context manager.
+
+MAX_EVENTS = 100_000
+
+_active = contextvars.ContextVar('profiler', default=None)
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3  # peak, where statm is missing
+
+
+class Stage:
+    # one timed stage; rows / bytes can be filled in while it runs
+    __slots__ = ('name', 'start', 'duration', 'rows', 'bytes', 'rss_before', 'rss_after', 'depth', 'thread')
+
+    def __init__(self, name, rows=None, bytes=None, depth=0):
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+        self.depth = depth
+        self.thread = threading.get_ident()
+        self.start = self.duration = self.rss_before = self.rss_after = None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    def __init__(self, max_events=MAX_EVENTS):
+        self.events = deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+        self._depth = 0
+
+    @contextmanager
+    def stage(self, name, rows=None, bytes=None):
+        event = Stage(name, rows, bytes, self._depth)
+        self._depth += 1
+        event.rss_before = _rss_mb()
+        event.start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            event.duration = time.perf_counter() - event.start
+            event.rss_after = _rss_mb()
+            self._depth -= 1
+            self.events.append(event)
+
+    def add(self, name, start, duration, rows=None, bytes=None):
+        # a stage timed by the caller, e.g. work interleaved with a generator's yields
+        event = Stage(name, rows, bytes, self._depth)
+        event.start, event.duration = start, duration
+        self.events.append(event)
+
+    def clear(self):
+        self.events.clear()
+        self.origin = time.perf_counter()
+
+    def summary(self):
+        # one row per stage name: calls, total / mean time, rows and bytes processed, RSS growth
+        if not self.events:
+            return pd.DataFrame(columns=['Stage', 'Calls', 'Total (s)', 'Mean (ms)', 'Rows', 'Bytes',
+                                         'Rows/s', 'Max RSS growth (MB)'])
+        events = pd.DataFrame([event.as_dict() for event in self.events])
+        events['growth'] = events['rss_after'] - events['rss_before']
+        grouped = events.groupby('name', sort=False)
+        summary = pd.DataFrame({
+            'Calls': grouped.size(),
+            'Total (s)': grouped['duration'].sum(),
+            'Mean (ms)': grouped['duration'].mean() * 1e3,
+            'Rows': grouped['rows'].sum(min_count=1),
+            'Bytes': grouped['bytes'].sum(min_count=1),
+            'Max RSS growth (MB)': grouped['growth'].max(),
+        })
+        summary['Rows/s'] = summary['Rows'] / summary['Total (s)']
+        summary = summary.sort_values('Total (s)', ascending=False).rename_axis('Stage').reset_index()
+        return summary[['Stage', 'Calls', 'Total (s)', 'Mean (ms)', 'Rows', 'Bytes', 'Rows/s', 'Max RSS growth (MB)']]
+
+    def to_json(self):
+        events = [dict(event.as_dict(), start=event.start - self.origin) for event in self.events]
+        return json.dumps({'events': events}, indent=1)
+
+    def to_chrome_trace(self):
+        # Trace Event Format, for chrome://tracing or https://ui.perfetto.dev
+        trace = []
+        for event in self.events:
+            args = {key: value for key, value in (('rows', event.rows), ('bytes', event.bytes)) if value is not None}
+            if event.rss_before is not None:
+                args['rss_before_mb'] = round(event.rss_before, 1)
+                args['rss_after_mb'] = round(event.rss_after, 1)
+            trace.append({'name': event.name, 'cat': event.name.split('.')[0], 'ph': 'X',
+                          'ts': (event.start - self.origin) * 1e6, 'dur': event.duration * 1e6,
+                          'pid': os.getpid(), 'tid': event.thread, 'args': args})
+        return json.dumps({'traceEvents': trace, 'displayTimeUnit': 'ms'})
+
+
+_global = Profiler() if os.environ.get('CHAT_PROFILE') else None
+
+
+def current():
+    return _active.get() or _global
+
+
+def activate(profiler):
+    # record into profiler for the rest of the current context (e.g. one streamlit script run);
+    # None switches recording off again
+    _active.set(profiler)
+
+
+@contextmanager
+def record(profiler=None):
+    profiler = profiler or Profiler()
+    token = _active.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active.reset(token)
+
+
+class _Noop:
+    # stands in for a Stage when nothing is recording, so callers can still set .rows / .bytes
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+def stage(name, rows=None, bytes=None):
+    profiler = current()
+    if profiler is None:
+        return _NOOP
+    return profiler.stage(name, rows, bytes)
+
+
+def add(name, start, duration, rows=None, bytes=None):
+    profiler = current()
+    if profiler is not None:
+        profiler.add(name, start, duration, rows, bytes)
+
+
+def timed(name=None):
+    # decorator: every call of the function is one stage (named module.function by default)
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current() is None:
+                return func(*args, **kwargs)
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
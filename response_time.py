@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from chat_index import NON_PARTICIPANTS, ChatIndex
+
+DEFAULT_CUTOFF_MINUTES = 240  # longer gaps are a new conversation, not a reply
+QUANTILES = (0.5, 0.9, 0.99)
+RELATIVE_ACCURACY = 0.01
+
+COLUMN = 'Response time (minutes)'
+
+
+def _bucket(values, gamma):
+    return np.ceil(np.log(values) / np.log(gamma)).astype(np.int64)
+
+
+def _bucket_value(bucket, gamma):
+    return 2 * gamma ** bucket / (gamma + 1)
+
+
+def grouped_quantiles(codes, values, num_groups, quantiles=QUANTILES, relative_accuracy=RELATIVE_ACCURACY):
+    # quantiles of every group at once, within relative_accuracy: one bincount over
+    # (group, log bucket) pairs, then a cumulative count per group to read the quantiles off.
+    # the answer is the bucket's midpoint clipped to the smallest / largest gap that fell in it
+    # for that group, so a lone 1 minute reply reports 1, not the midpoint 0.99
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    result = np.full((num_groups, len(quantiles)), np.nan)
+    if not len(values):
+        return result
+    positive = values > 0
+    buckets = np.zeros(len(values), dtype=np.int64)
+    buckets[positive] = _bucket(values[positive], gamma)
+    low = buckets[positive].min() if positive.any() else 0
+    # slot 0 holds zero gaps, slot i the log bucket low + i - 1
+    slots = np.where(positive, buckets - low + 1, 0)
+    width = int(slots.max()) + 1
+    cells = codes * width + slots
+    counts = np.bincount(cells, minlength=num_groups * width).reshape(num_groups, width)
+    smallest = np.full(num_groups * width, np.inf)
+    largest = np.full(num_groups * width, -np.inf)
+    np.minimum.at(smallest, cells, values)
+    np.maximum.at(largest, cells, values)
+    cumulative = counts.cumsum(axis=1)
+    totals = cumulative[:, -1]
+    representative = np.concatenate([[0.0], _bucket_value(np.arange(low, low + width - 1), gamma)])
+    rows = np.arange(num_groups)
+    for j, q in enumerate(quantiles):
+        rank = q * (totals - 1)
+        slot = (cumulative <= rank[:, None]).sum(axis=1).clip(max=width - 1)
+        cell = rows * width + slot
+        estimate = np.clip(representative[slot], smallest[cell], largest[cell])
+        result[:, j] = np.where(totals > 0, estimate, np.nan)
+    return result
+
+
+@profiling.timed()
+def response_times(df, cutoff_minutes=DEFAULT_CUTOFF_MINUTES):
+    # one row per reply: a participant's message following someone else's within the cutoff.
+    # works on the timestamp / user-code arrays; the gap of every message is computed once
+    df = df[~df['user'].isin(NON_PARTICIPANTS)]
+    timestamps = df['timestamp'].to_numpy()
+    order = None if df['timestamp'].is_monotonic_increasing else np.argsort(timestamps, kind='stable')
+    if order is not None:
+        df = df.iloc[order]
+        timestamps = timestamps[order]
+    users = df['user'].astype('category')
+    codes = users.cat.codes.to_numpy()
+
+    gaps = np.diff(timestamps) / np.timedelta64(1, 'm')
+    replies = np.flatnonzero((codes[1:] != codes[:-1]) & (gaps <= cutoff_minutes)) + 1
+    names = users.cat.categories
+    return pd.DataFrame({
+        'timestamp': timestamps[replies],
+        'user': names[codes[replies]],
+        'to': names[codes[replies - 1]],
+        'Day_name': df['Day_name'].take(replies).reset_index(drop=True),
+        COLUMN: gaps[replies - 1],
+    })
+
+
+@profiling.timed()
+def summarize(responses, by, quantiles=QUANTILES):
+    # count, mean and quantiles (within RELATIVE_ACCURACY) of the reply gaps per group of `by` columns
+    grouped = responses.groupby(by, observed=True, sort=True)
+    summary = grouped[COLUMN].agg(['count', 'mean']).reset_index()
+    codes = grouped.ngroup().to_numpy()
+    estimates = grouped_quantiles(codes, responses[COLUMN].to_numpy(), len(summary), quantiles)
+    summary.columns = list(summary.columns[:-2]) + ['Responses', 'Mean (minutes)']
+    for j, q in enumerate(quantiles):
+        label = 'Median' if q == 0.5 else f'P{round(q * 100)}'
+        summary[f'{label} (minutes)'] = estimates[:, j]
+    return summary
+
+
+@dataclass
+class ResponseTimeReport:
+    responses: pd.DataFrame  # every reply with its gap
+    by_user: pd.DataFrame
+    by_pair: pd.DataFrame  # replier -> original sender
+    by_day: pd.DataFrame
+    cutoff_minutes: float
+
+
+def analyze(df, cutoff_minutes=DEFAULT_CUTOFF_MINUTES):
+    # with a ChatIndex the report is computed once per cutoff and reused by every caller
+    if isinstance(df, ChatIndex):
+        return df.memo(('response_time', cutoff_minutes), lambda: analyze(df.df, cutoff_minutes))
+
+    responses = response_times(df, cutoff_minutes)
+    by_user = summarize(responses, ['user']).rename(columns={'user': 'User'})
+    by_pair = summarize(responses, ['user', 'to']).rename(columns={'user': 'Replier', 'to': 'Replying to'})
+    by_day = summarize(responses, ['Day_name'])
+    return ResponseTimeReport(responses, by_user, by_pair, by_day, cutoff_minutes)
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import chat_cache
+import profiling
+
+# analysis results shared by every session and worker process on one machine: a SQLite file
+# mapping (content hash, function, user, parameters) to the pickled output (tables, PNG bytes,
+# reports). Entries expire after ttl seconds and the least recently used go once the store
+# outgrows max_bytes. Hit / miss / eviction counters live in the same file, so they add up
+# across processes (see stats, or python result_cache.py).
+
+# bump when an analysis output changes shape so stale results are never served
+RESULTS_VERSION = 1
+DEFAULT_PATH = os.path.join(chat_cache.DEFAULT_CACHE_DIR, 'results.sqlite')
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 << 20  # 256 MiB
+MAX_ENTRY_SHARE = 0.25  # larger results are recomputed instead of pushing everything else out
+
+COUNTERS = ('hits', 'misses', 'expired', 'evictions', 'too_large', 'errors')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+MISSING = object()
+
+
+def make_key(digest, function, user='Overall', **params):
+    params = json.dumps(params, sort_keys=True, default=str) if params else ''
+    return f'v{RESULTS_VERSION}:{digest}:{function}:{user}:{params}'
+
+
+class ResultCache:
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        # one connection per thread and process; streamlit serves sessions from several threads
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')  # readers don't block the writer
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _count(self, name, n=1):
+        self._db().execute('INSERT INTO counters VALUES (?, ?) '
+                           'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value', (name, n))
+
+    def get(self, key, default=MISSING):
+        db = self._db()
+        row = db.execute('SELECT value, created FROM results WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is not None and now - row[1] > self.ttl:
+            db.execute('DELETE FROM results WHERE key = ?', (key,))
+            self._count('expired')
+            row = None
+        if row is None:
+            self._count('misses')
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # written by an incompatible pandas / numpy; drop it and recompute
+            db.execute('DELETE FROM results WHERE key = ?', (key,))
+            self._count('errors')
+            self._count('misses')
+            return default
+        db.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+        self._count('hits')
+        return value
+
+    def put(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes * MAX_ENTRY_SHARE:
+            self._count('too_large')
+            return False
+        now = time.time()
+        self._db().execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                           (key, data, len(data), now, now))
+        self.evict()
+        return True
+
+    def get_or_compute(self, digest, function, user, compute, **params):
+        key = make_key(digest, function, user, **params)
+        with profiling.stage('result_cache.get'):
+            value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            with profiling.stage('result_cache.put'):
+                self.put(key, value)
+        return value
+
+    def evict(self):
+        db = self._db()
+        expired = db.execute('DELETE FROM results WHERE created < ?', (time.time() - self.ttl,)).rowcount
+        if expired:
+            self._count('expired', expired)
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in db.execute('SELECT key, size FROM results ORDER BY accessed').fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute('DELETE FROM results WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        self._count('evictions', evicted)
+
+    def stats(self):
+        # counters since the last reset_stats, plus what is stored right now
+        db = self._db()
+        stats = dict.fromkeys(COUNTERS, 0)
+        stats.update(db.execute('SELECT name, value FROM counters').fetchall())
+        stats['entries'], stats['bytes'] = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+        return stats
+
+    def reset_stats(self):
+        self._db().execute('DELETE FROM counters')
+
+    def clear(self):
+        self._db().execute('DELETE FROM results')
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    # location, lifetime and size can be overridden with CHAT_RESULTS_PATH / CHAT_RESULTS_TTL /
+    # CHAT_RESULTS_MAX_BYTES
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache(os.environ.get('CHAT_RESULTS_PATH', DEFAULT_PATH),
+                                     float(os.environ.get('CHAT_RESULTS_TTL', DEFAULT_TTL)),
+                                     int(os.environ.get('CHAT_RESULTS_MAX_BYTES', DEFAULT_MAX_BYTES)))
+    return _default_cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show (or reset) the shared analysis result cache.')
+    parser.add_argument('--path', default=None, help='cache file (default: CHAT_RESULTS_PATH or ' + DEFAULT_PATH + ')')
+    parser.add_argument('--reset-stats', action='store_true', help='zero the hit / miss counters')
+    parser.add_argument('--clear', action='store_true', help='drop every stored result')
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.path) if args.path else get_default_cache()
+    print(json.dumps(cache.stats(), indent=1))
+    if args.reset_stats:
+        cache.reset_stats()
+    if args.clear:
+        cache.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+import chat_parser
+import links
+import profiling
+import tokenizer
+from chat_index import ChatIndex, select
+
+# per-chat rollup cube: for every (user, day, hour of day) how many messages, words, media and
+# links were sent, as dense (users x days x 24) arrays. Days run from the chat's first to its
+# last day. Every timeline, the hourly distribution and the weekday heatmap are reductions of
+# it, per user or Overall, so switching user never goes back to the raw rows.
+
+METRICS = ('messages', 'words', 'media', 'links')
+
+# column the count lands in, matching the tables the helper functions always returned
+COLUMNS = {'messages': 'message'}
+
+# pandas resample rules per granularity; weeks start on Monday
+FREQUENCIES = {'day': 'D', 'week': 'W-MON', 'month': 'MS', 'year': 'YS'}
+
+
+def _per_row(metric, messages):
+    # the metric's contribution of each message, for the cube's bincount weights
+    if metric == 'words':
+        return messages.str.split().str.len().to_numpy(dtype=np.float64)
+    if metric == 'media':
+        return messages.isin(tokenizer.MEDIA_PLACEHOLDERS).to_numpy(dtype=np.float64)
+    return messages.str.count(links.URL_PATTERN).to_numpy(dtype=np.float64)
+
+
+class Rollup:
+
+    def __init__(self, users, first_day, num_days, cells, messages, date_dtype):
+        self.users = users  # {user: position on the cube's first axis}
+        self.first_day = first_day  # numpy datetime64[D]
+        self.num_days = num_days
+        self.date_dtype = date_dtype  # dtype of the frame's 'date' column, for the tables
+        self._cells = cells  # flat cube cell of each row, kept until every metric is filled in
+        self._messages = messages
+        self._cubes = {}
+
+    @classmethod
+    @profiling.timed('rollup.build')
+    def build(cls, df):
+        codes, users = pd.factorize(df['user'].astype(str))
+        days = df['timestamp'].to_numpy().astype('datetime64[D]')
+        first_day = days.min() if len(days) else np.datetime64('1970-01-01', 'D')
+        num_days = int((days.max() - first_day).astype(int)) + 1 if len(days) else 0
+        hours = df['hour'].to_numpy(dtype=np.int64)
+        cells = (codes.astype(np.int64) * num_days + (days - first_day).astype(np.int64)) * 24 + hours
+        rollup = cls({user: i for i, user in enumerate(users)}, first_day, num_days, cells,
+                     df['message'].astype(str), df['date'].dtype)
+        rollup.cube('messages')
+        return rollup
+
+    def cube(self, metric='messages'):
+        # users x days x 24 counts of one metric; the rest are filled in on first use
+        if metric not in self._cubes:
+            if metric not in METRICS:
+                raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+            weights = None if metric == 'messages' else _per_row(metric, self._messages)
+            size = len(self.users) * self.num_days * 24
+            counts = np.bincount(self._cells, weights=weights, minlength=size)
+            self._cubes[metric] = counts.astype(np.int32).reshape(len(self.users), self.num_days, 24)
+            if len(self._cubes) == len(METRICS):
+                self._cells = self._messages = None
+        return self._cubes[metric]
+
+    def merge(self, other, sign=1):
+        # adds other's counts (sign=-1 takes them back out), widening the cube to both date
+        # ranges and every user of either; all metrics are filled in first
+        parts = [rollup for rollup in (self, other) if rollup.num_days]
+        if not parts:
+            return self
+        first_day = min(rollup.first_day for rollup in parts)
+        num_days = int((max(rollup.first_day + rollup.num_days for rollup in parts) - first_day).astype(int))
+        users = dict(self.users)
+        for user in other.users:
+            users.setdefault(user, len(users))
+        cubes = {}
+        for metric in METRICS:
+            cube = np.zeros((len(users), num_days, 24), dtype=np.int32)
+            for rollup, factor in ((self, 1), (other, sign)):
+                if rollup.num_days:
+                    rows = [users[user] for user in rollup.users]
+                    start = int((rollup.first_day - first_day).astype(int))
+                    cube[rows, start:start + rollup.num_days] += factor * rollup.cube(metric)
+            cubes[metric] = cube
+        self.users, self.first_day, self.num_days, self._cubes = users, first_day, num_days, cubes
+        self._cells = self._messages = None
+        return self
+
+    def grid(self, user='Overall', metric='messages'):
+        # days x 24 counts for one user, or summed over everyone
+        cube = self.cube(metric)
+        if user == 'Overall':
+            return cube.sum(axis=0)
+        if user not in self.users:
+            return np.zeros(cube.shape[1:], dtype=cube.dtype)
+        return cube[self.users[user]]
+
+    @property
+    def dates(self):
+        return self.first_day + np.arange(self.num_days)
+
+    @property
+    def nbytes(self):
+        return sum(cube.nbytes for cube in self._cubes.values())
+
+    def totals(self, user='Overall'):
+        # (messages, words, media, links)
+        return tuple(int(self.grid(user, metric).sum()) for metric in METRICS)
+
+    def _dates(self, dates):
+        if self.date_dtype == object:
+            return pd.DatetimeIndex(dates).date
+        return pd.DatetimeIndex(dates).astype(self.date_dtype)
+
+    def timeline(self, user='Overall', freq='day', metric='messages'):
+        # [date, count] per day / week / month / year (labelled by its first day); only periods
+        # with at least one message are listed, like the groupby it replaces
+        grid = self.grid(user, metric)
+        per_day = pd.DataFrame({'count': grid.sum(axis=1), 'active': self.grid(user).sum(axis=1)},
+                               index=pd.DatetimeIndex(self.dates))
+        if freq != 'day':
+            per_day = per_day.resample(FREQUENCIES[freq], label='left', closed='left').sum()
+        per_day = per_day[per_day['active'] > 0]
+        return pd.DataFrame({'date': self._dates(per_day.index),
+                             COLUMNS.get(metric, metric): per_day['count'].to_numpy()})
+
+    def monthly(self, user='Overall', metric='messages'):
+        # year, month (ordered categorical), count and 'YYYY-Mon' labels, in calendar order
+        months = self.timeline(user, 'month', metric)
+        starts = pd.DatetimeIndex(months.pop('date'))
+        table = pd.DataFrame({
+            'year': starts.year,
+            'month': pd.Categorical.from_codes(starts.month - 1, categories=chat_parser.MONTHS, ordered=True),
+        })
+        table[months.columns[0]] = months.iloc[:, 0].to_numpy()
+        table['time'] = table['year'].astype(str) + "-" + table['month'].astype(str)
+        return table
+
+    def hourly(self, user='Overall', metric='messages'):
+        # count per hour of day, for the hours anyone was active
+        totals = self.grid(user, metric).sum(axis=0)
+        active = self.grid(user).sum(axis=0) > 0
+        return pd.Series(totals[active], index=pd.Index(np.flatnonzero(active), name='hour'),
+                         name=COLUMNS.get(metric, metric))
+
+    def heatmap(self, user='Overall', metric='messages'):
+        # weekday x hour counts; weekdays and hours without any message are left out
+        weekdays = pd.DatetimeIndex(self.dates).dayofweek.to_numpy()
+        table = np.zeros((7, 24), dtype=np.int64)
+        active = np.zeros((7, 24), dtype=np.int64)
+        np.add.at(table, weekdays, self.grid(user, metric))
+        np.add.at(active, weekdays, self.grid(user))
+        rows, columns = active.sum(axis=1) > 0, active.sum(axis=0) > 0
+        index = pd.CategoricalIndex(np.array(chat_parser.DAY_NAMES)[rows], categories=chat_parser.DAY_NAMES,
+                                    ordered=True, name='Day_name')
+        return pd.DataFrame(table[rows][:, columns], index=index,
+                            columns=pd.Index(np.flatnonzero(columns), name='hour'))
+
+
+def for_chat(df, user='Overall'):
+    # a ChatIndex's cube is built once for the whole chat and shared by every user; a plain
+    # frame only rolls up the rows of user
+    if isinstance(df, ChatIndex):
+        return df.memo('rollup', lambda: Rollup.build(df.df))
+    return Rollup.build(select(user, df))
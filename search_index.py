@@ -0,0 +1,204 @@
+import os
+import re
+import string
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import profiling
+import tokenizer
+from chat_index import ChatIndex
+
+# inverted index over the message column: every token (same cleanup and stopwords as
+# helper.cleaned_message, minus surrounding punctuation) maps to the sorted row positions of
+# the messages containing it. Row lists are delta encoded and stored as LEB128 varints, one
+# byte for most gaps, in a single byte array with an offset per term.
+INDEX_VERSION = 1
+SUFFIX = f'search{INDEX_VERSION}.npz'
+
+# "exact phrase", prefix* or term; every clause must match
+QUERY = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _search_tokens(tokens):
+    tokens = tokens.str.strip(string.punctuation)
+    return tokens[tokens != '']
+
+
+def normalize(messages, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    # Series of search tokens, one row per token, indexed by the message's row
+    return _search_tokens(tokenizer.tokenize(messages, stopwords))
+
+
+def _varint_encode(values):
+    values = values.astype(np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    owner = np.repeat(np.arange(len(values)), sizes)
+    starts = np.cumsum(sizes) - sizes
+    byte = np.arange(len(owner)) - starts[owner]
+    encoded = ((values[owner] >> (np.uint64(7) * byte.astype(np.uint64))) & np.uint64(0x7F)).astype(np.uint8)
+    encoded[byte < sizes[owner] - 1] |= 0x80  # continuation bit on all but the last byte
+    return encoded, sizes
+
+
+def _varint_decode(data):
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    owner = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shift = 7 * (np.arange(len(data)) - starts[owner])
+    # row positions stay far below 2**53, so float weights are exact
+    return np.bincount(owner, weights=(data & 0x7F).astype(np.float64) * 2.0 ** shift,
+                       minlength=len(ends)).astype(np.int64)
+
+
+class SearchIndex:
+
+    def __init__(self, vocabulary, offsets, postings, num_rows, stopwords=tokenizer.DEFAULT_STOPWORDS):
+        self.vocabulary = vocabulary  # sorted numpy array of tokens
+        self.offsets = offsets  # byte range of term i in postings: offsets[i]:offsets[i + 1]
+        self.postings = postings
+        self.num_rows = num_rows
+        self.stopwords = stopwords
+
+    @classmethod
+    def build(cls, df, stopwords=tokenizer.DEFAULT_STOPWORDS):
+        with profiling.stage('search.build', rows=len(df)) as stage:
+            tokens = _search_tokens(tokenizer.corpus(df.reset_index(drop=True), stopwords))
+            codes, vocabulary = pd.factorize(tokens, sort=True)
+            # one (term, row) pair per distinct token of a message, sorted by term then row
+            pairs = np.sort(codes.astype(np.int64) * max(len(df), 1) + tokens.index.to_numpy())
+            pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+            terms, rows = np.divmod(pairs, max(len(df), 1))
+            counts = np.bincount(terms, minlength=len(vocabulary))
+            firsts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            gaps = np.diff(rows, prepend=0)
+            gaps[firsts[counts > 0]] = rows[firsts[counts > 0]]  # each term's list starts absolute
+            postings, sizes = _varint_encode(gaps)
+            offsets = np.concatenate([[0], np.cumsum(sizes)])[np.concatenate([firsts, [len(rows)]])]
+            stage.bytes = postings.nbytes
+        return cls(np.asarray(vocabulary, dtype=object), offsets, postings, len(df), stopwords)
+
+    def rows(self, term):
+        # sorted row positions of the messages containing term
+        i = np.searchsorted(self.vocabulary, term)
+        if i == len(self.vocabulary) or self.vocabulary[i] != term:
+            return np.empty(0, dtype=np.int64)
+        return np.cumsum(_varint_decode(self.postings[self.offsets[i]:self.offsets[i + 1]]))
+
+    def prefix_rows(self, prefix):
+        # union over every token starting with prefix; the sorted vocabulary makes them one range
+        lo = np.searchsorted(self.vocabulary, prefix, 'left')
+        hi = np.searchsorted(self.vocabulary, prefix + '\U0010FFFF', 'left')
+        if lo == hi:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.rows(term) for term in self.vocabulary[lo:hi]]))
+
+    def save(self, path):
+        vocabulary = [term.encode('utf-8') for term in self.vocabulary]
+        np.savez(path, vocabulary=np.frombuffer(b''.join(vocabulary), dtype=np.uint8),
+                 vocabulary_offsets=np.cumsum([0] + [len(term) for term in vocabulary]),
+                 offsets=self.offsets, postings=self.postings, num_rows=self.num_rows,
+                 stopwords=np.array(self.stopwords))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            text = data['vocabulary'].tobytes()
+            bounds = data['vocabulary_offsets']
+            vocabulary = np.array([text[a:b].decode('utf-8') for a, b in zip(bounds[:-1], bounds[1:])], dtype=object)
+            return cls(vocabulary, data['offsets'], data['postings'], int(data['num_rows']), str(data['stopwords']))
+
+
+def for_chat(chat, cache=None, key=None, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    # the chat's index, memoised on its ChatIndex; with a ChatCache and the chat's cache key it is
+    # also stored next to the parsed frame (and evicted with it), so it is built once per export
+    def load_or_build():
+        path = cache.sidecar_path(key, SUFFIX) if cache is not None and key is not None else None
+        if path is not None and os.path.exists(path):
+            try:
+                index = SearchIndex.load(path)
+                if index.num_rows == len(chat.df) and index.stopwords == stopwords:
+                    return index
+            except (OSError, ValueError, KeyError):
+                pass
+        index = SearchIndex.build(chat.df, stopwords)
+        # not once the frame is evicted: nothing would ever remove the index
+        if path is not None and key in cache:
+            fd, tmp_path = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                index.save(file)
+            os.replace(tmp_path, path)
+        return index
+    return chat.memo(('search_index', key, stopwords), load_or_build)
+
+
+def parse_query(query, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    # [('term', token) | ('prefix', text) | ('phrase', [tokens])]; stopwords are dropped like
+    # they are from the index
+    clauses = []
+    for phrase, word in QUERY.findall(query):
+        if word.endswith('*') and len(word) > 1:
+            prefix = word[:-1].lower().strip(string.punctuation)
+            if prefix:
+                clauses.append(('prefix', prefix))
+            continue
+        tokens = normalize(pd.Series([phrase or word]), stopwords).tolist()
+        if len(tokens) == 1:
+            clauses.append(('term', tokens[0]))
+        elif tokens:
+            clauses.append(('phrase', tokens))
+    return clauses
+
+
+def _phrase_rows(tokens, phrase):
+    # rows (index labels of tokens) where the phrase's words follow each other within one message
+    words = tokens.to_numpy(dtype=object)
+    owners = tokens.index.to_numpy()
+    n = len(words) - len(phrase) + 1
+    if n <= 0:
+        return owners[:0]
+    found = np.ones(n, dtype=bool)
+    for k, word in enumerate(phrase):
+        found &= (words[k:k + n] == word) & (owners[k:k + n] == owners[:n])
+    return owners[:n][found]
+
+
+@profiling.timed()
+def search(chat, query, start=None, end=None, users=None, index=None):
+    # messages matching every clause of query, optionally within [start, end) and by users.
+    # chat is a ChatIndex (or parsed frame); index defaults to for_chat(chat)
+    chat = chat if isinstance(chat, ChatIndex) else ChatIndex(chat)
+    index = index or for_chat(chat)
+    clauses = parse_query(query, index.stopwords)
+    if not clauses:
+        return chat.df.iloc[:0]
+
+    matches = []
+    for kind, value in clauses:
+        if kind == 'term':
+            matches.append(index.rows(value))
+        elif kind == 'prefix':
+            matches.append(index.prefix_rows(value))
+        else:
+            # rows holding every word, then checked for the words in order (stopwords in
+            # between are skipped, as they are not in the index)
+            candidates = _intersect([index.rows(word) for word in value])
+            messages = chat.df['message'].take(candidates).reset_index(drop=True)
+            tokens = normalize(messages, index.stopwords)
+            matches.append(candidates[np.unique(_phrase_rows(tokens, value))])
+    if start is not None or end is not None or users is not None:
+        matches.append(chat.rows(start, end, users))
+    return chat.df.take(_intersect(matches))
+
+
+def _intersect(arrays):
+    arrays = sorted(arrays, key=len)
+    rows = arrays[0]
+    for other in arrays[1:]:
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
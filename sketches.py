@@ -0,0 +1,208 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import chat_parser
+import emoji_extractor
+import tokenizer
+
+# approximate top-K counting in bounded memory: a count-min sketch for the frequency of any
+# item plus a Space-Saving summary that keeps the heavy-hitter candidates. Both only ever
+# overestimate, so an item's estimate is the smaller of the two. Sketches built with the same
+# parameters merge exactly (per user -> Overall, per chunk -> whole chat).
+
+DEFAULT_WIDTH = 4096
+DEFAULT_DEPTH = 4
+CAPACITY_PER_ITEM = 16  # Space-Saving slots per requested top item
+SEED = 0x5EED  # one hash family for every sketch, so any two can be merged
+
+
+def _hash(items):
+    return pd.util.hash_array(np.asarray(items, dtype=object))
+
+
+class CountMinSketch:
+    # depth x width counters; an estimate exceeds the true count by at most e * total / width
+    # with probability 1 - exp(-depth)
+
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        rng = np.random.default_rng(SEED)
+        self.a = rng.integers(1, 2 ** 63, depth, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, depth, dtype=np.uint64)
+        self.total = 0
+
+    def _cells(self, hashes):
+        # multiply-shift hashing, one row of the table per hash function (uint64 math wraps)
+        with np.errstate(over='ignore'):
+            mixed = hashes[None, :] * self.a[:, None] + self.b[:, None]
+        return ((mixed >> np.uint64(32)) % np.uint64(self.table.shape[1])).astype(np.intp)
+
+    def add(self, hashes, counts):
+        counts = np.asarray(counts, dtype=np.int64)
+        for row, cells in enumerate(self._cells(hashes)):
+            self.table[row] += np.bincount(cells, weights=counts, minlength=self.table.shape[1]).astype(np.int64)
+        self.total += int(counts.sum())
+        return self
+
+    def estimate(self, hashes):
+        cells = self._cells(hashes)
+        return self.table[np.arange(len(cells))[:, None], cells].min(axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def error_bound(self):
+        return math.e * self.total / self.table.shape[1]
+
+
+class SpaceSaving:
+    # at most capacity (item, count, error) entries; every count overestimates the truth by at
+    # most its error, which is at most total / capacity
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.total = 0
+
+    def _floor(self):
+        # what an item missing from a full summary may have had
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def _merge(self, counts, errors, floor, total):
+        # mergeable-summaries rule: items missing on one side get that side's floor as count and
+        # error, then the capacity largest counts are kept
+        items = self.counts.index.union(counts.index)
+        mine, theirs = self._floor(), floor
+        merged = (self.counts.reindex(items, fill_value=mine)
+                  + counts.reindex(items, fill_value=theirs))
+        merged_errors = (self.errors.reindex(items, fill_value=mine)
+                         + errors.reindex(items, fill_value=theirs))
+        self.counts = merged.nlargest(self.capacity, keep='first')
+        self.errors = merged_errors.reindex(self.counts.index)
+        self.total += total
+        return self
+
+    def add(self, counts):
+        # counts: exact counts of one batch (a Series indexed by item)
+        counts = counts.astype(np.int64)
+        return self._merge(counts, pd.Series(0, index=counts.index, dtype=np.int64), 0, int(counts.sum()))
+
+    def merge(self, other):
+        return self._merge(other.counts, other.errors, other._floor(), other.total)
+
+    def error_bound(self):
+        return self.total / self.capacity
+
+
+class TopK:
+
+    def __init__(self, k, capacity=None, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.summary = SpaceSaving(capacity or k * CAPACITY_PER_ITEM)
+
+    @property
+    def total(self):
+        return self.sketch.total
+
+    def add(self, items):
+        # items: Series / array of occurrences from one batch; only the batch's distinct items
+        # are held at once
+        counts = pd.Series(items, dtype=object).value_counts(sort=False)
+        if len(counts):
+            self.sketch.add(_hash(counts.index), counts.to_numpy())
+            self.summary.add(counts)
+        return self
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.summary.merge(other.summary)
+        return self
+
+    def top(self, k=None):
+        # [(item, estimated count)], most frequent first, like Counter.most_common
+        candidates = self.summary.counts
+        if not len(candidates):
+            return []
+        estimates = np.minimum(candidates.to_numpy(), self.sketch.estimate(_hash(candidates.index)))
+        ranked = pd.Series(estimates, index=candidates.index).sort_values(ascending=False, kind='stable')
+        return list(ranked.head(k or self.k).items())
+
+    def error_bound(self):
+        # no estimate exceeds its true count by more than this (the count-min part with
+        # probability 1 - exp(-depth))
+        return min(self.summary.error_bound(), self.sketch.error_bound())
+
+    @property
+    def nbytes(self):
+        return (self.sketch.table.nbytes + self.summary.counts.memory_usage(deep=True)
+                + self.summary.errors.memory_usage(deep=True))
+
+
+class ChatSketches:
+    # per-user word and emoji TopK sketches; 'Overall' is the merge of every user's
+
+    def __init__(self, words=20, emojis=10):
+        self.k = {'words': words, 'emojis': emojis}
+        self.users = {}
+
+    def _sketch(self, user, kind):
+        sketches = self.users.setdefault(user, {})
+        if kind not in sketches:
+            sketches[kind] = TopK(self.k[kind])
+        return sketches[kind]
+
+    def add(self, df, stopwords=tokenizer.DEFAULT_STOPWORDS):
+        # one parsed batch: the same words most_common_words counts, and every emoji
+        df = df.reset_index(drop=True)
+        users = df['user'].astype(str)
+        words = tokenizer.corpus(df, stopwords)
+        words = words[~emoji_extractor.is_emoji_only(words)]
+        for kind, items in (('words', words), ('emojis', emoji_extractor.extract(df['message']))):
+            for user, group in items.groupby(users.loc[items.index].to_numpy(), sort=False):
+                self._sketch(user, kind).add(group.to_numpy())
+        return self
+
+    def merge(self, other):
+        for user, sketches in other.users.items():
+            for kind, sketch in sketches.items():
+                self._sketch(user, kind).merge(sketch)
+        return self
+
+    def get(self, kind, user='Overall'):
+        if user != 'Overall':
+            return self.users.get(user, {}).get(kind) or TopK(self.k[kind])
+        overall = TopK(self.k[kind])
+        for sketches in self.users.values():
+            if kind in sketches:
+                overall.merge(sketches[kind])
+        return overall
+
+    def words(self, user='Overall'):
+        return pd.DataFrame(self.get('words', user).top())
+
+    def emojis(self, user='Overall'):
+        return pd.DataFrame(self.get('emojis', user).top())
+
+
+def sketch_frame(df, batch_size=chat_parser.DEFAULT_BATCH_SIZE, stopwords=tokenizer.DEFAULT_STOPWORDS):
+    # an already parsed frame, fed in row batches so the token lists stay batch sized
+    sketches = ChatSketches()
+    for start in range(0, len(df), batch_size):
+        sketches.add(df.iloc[start:start + batch_size], stopwords)
+    return sketches
+
+
+def sketch_stream(source, batch_size=chat_parser.DEFAULT_BATCH_SIZE, stopwords=tokenizer.DEFAULT_STOPWORDS,
+                  **kwargs):
+    # straight from the export (anything chat_parser.iter_batches reads) without keeping the
+    # parsed frame: memory is one batch plus the sketches, whatever the size of the chat
+    sketches = ChatSketches()
+    for batch in chat_parser.iter_batches(source, batch_size=batch_size, **kwargs):
+        sketches.add(batch, stopwords)
+    return sketches
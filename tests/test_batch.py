@@ -0,0 +1,52 @@
+import json
+
+import batch
+
+TEXT_ONLY = ("12/05/23, 9:41 PM - Alice: are we meeting today\n"
+             "12/05/23, 9:43 PM - Bob: yes at five\n")
+
+
+def test_run_text_only_export(tmp_path):
+    # no emoji, no links: the tables come out empty with their columns instead of failing the chat
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    (exports / 'WhatsApp Chat with Alice.txt').write_text(TEXT_ONLY, encoding='utf-8')
+    out = tmp_path / 'out'
+
+    summary = batch.run([str(exports)], str(out), workers=1, log=lambda message: None)
+    assert summary['processed'] == 1 and summary['failed'] == 0
+
+    [path] = [path for path in out.glob('*.json') if path.name != batch.MANIFEST]
+    result = json.loads(path.read_text(encoding='utf-8'))
+    assert result['summary']['messages'] == 2
+    assert result['tables']['emojis'] == []
+    assert {row['word'] for row in result['tables']['words']} >= {'meeting'}
+
+    # a second run skips the unchanged export
+    summary = batch.run([str(exports)], str(out), workers=1, log=lambda message: None)
+    assert summary['skipped'] == 1 and summary['processed'] == 0
+
+
+def test_pairs_of_an_empty_table():
+    table = batch.pairs(batch.pd.DataFrame(), ['emoji', 'count'])
+    assert list(table.columns) == ['emoji', 'count'] and table.empty
+
+
+def test_run_with_store_appends_re_exports(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    export = exports / 'WhatsApp Chat with Alice.txt'
+    out, store = tmp_path / 'out', tmp_path / 'store'
+    records = []
+
+    # the 13th tells month from day, so the stored date format is settled
+    text = "12/13/23, 9:41 PM - Alice: are we meeting today\n12/13/23, 9:43 PM - Bob: yes at five\n"
+    export.write_text(text, encoding='utf-8')
+    batch.run([str(exports)], str(out), workers=1, log=records.append, store_dir=str(store))
+    export.write_text(text + "12/14/23, 8:00 AM - Alice: see you there 👍\n", encoding='utf-8')
+    summary = batch.run([str(exports)], str(out), workers=1, log=records.append, store_dir=str(store))
+
+    assert summary['processed'] == 1 and summary['messages'] == 3
+    assert any('3 messages, appended' in line for line in records)
+    [path] = [path for path in out.glob('*.json') if path.name != batch.MANIFEST]
+    assert json.loads(path.read_text(encoding='utf-8'))['tables']['emojis'] == [{'emoji': '👍', 'count': 1}]
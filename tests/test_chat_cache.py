@@ -0,0 +1,77 @@
+import os
+
+import chat_cache
+import chat_index
+import helper
+import search_index
+from benchmarks.synthetic import generate_chat
+
+
+def frame(messages=200, seed=0):
+    return helper.preprocess(generate_chat(messages, seed=seed))
+
+
+def names(cache):
+    return sorted(os.listdir(cache.directory))
+
+
+def test_sidecars_count_and_go_with_their_chat(tmp_path):
+    cache = chat_cache.ChatCache(str(tmp_path), max_bytes=1 << 30)
+    cache.put('a', frame())
+    arrow = os.path.getsize(cache._path('a'))
+    with open(cache.sidecar_path('a', 'extra'), 'wb') as file:
+        file.write(b'x' * arrow)
+
+    # the arrow file alone fits, with its sidecar it doesn't
+    cache.max_bytes = arrow + arrow // 2
+    cache.evict()
+    assert names(cache) == []
+
+
+def test_orphan_sidecars_are_removed(tmp_path):
+    cache = chat_cache.ChatCache(str(tmp_path))
+    with open(cache.sidecar_path('gone', 'search1.npz'), 'wb') as file:
+        file.write(b'stale')
+    cache.put('a', frame())
+    assert names(cache) == [f'a.v{chat_cache.CACHE_VERSION}.arrow']
+
+
+def test_search_index_not_written_for_an_evicted_chat(tmp_path):
+    cache = chat_cache.ChatCache(str(tmp_path))
+    df = cache.put('a', frame())
+    chat = chat_index.ChatIndex(df)
+    search_index.for_chat(chat, cache, 'a')
+    assert len(names(cache)) == 2
+
+    cache.clear()
+    assert names(cache) == []
+    index = search_index.for_chat(chat_index.ChatIndex(df), cache, 'a')
+    assert len(index.vocabulary) and names(cache) == []
+
+
+def test_least_recently_used_chats_go_first(tmp_path):
+    cache = chat_cache.ChatCache(str(tmp_path), max_bytes=1 << 30)
+    for key in 'abc':
+        cache.put(key, frame())
+    size = os.path.getsize(cache._path('a'))
+    for key, sidecar in (('a', size), ('b', 16), ('c', size // 2)):
+        with open(cache.sidecar_path(key, 'extra'), 'wb') as file:
+            file.write(b'x' * sidecar)
+        os.utime(cache._path(key), (ord(key), ord(key)))
+    assert cache.get('a') is not None  # a is now the most recently used
+
+    # b goes: its .arrow file is the oldest, however recently its sidecar was written
+    cache.max_bytes = 4 * size
+    cache.evict()
+    assert names(cache) == [f'{key}.v{chat_cache.CACHE_VERSION}.{suffix}'
+                            for key in 'ac' for suffix in ('arrow', 'extra')]
+    assert 'b' not in cache and 'a' in cache
+
+    # then c, with its sidecar
+    cache.max_bytes = 2 * size + size // 2
+    cache.evict()
+    assert names(cache) == [f'a.v{chat_cache.CACHE_VERSION}.arrow', f'a.v{chat_cache.CACHE_VERSION}.extra']
+
+    # a new chat pushes out a, which takes twice its .arrow file with the sidecar
+    cache.put('d', frame())
+    assert names(cache) == [f'd.v{chat_cache.CACHE_VERSION}.arrow']
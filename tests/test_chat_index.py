@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import chat_index
+import helper
+from benchmarks.synthetic import generate_chat
+
+
+@pytest.fixture(scope='module', params=['sorted', 'shuffled'])
+def df(request):
+    df = helper.preprocess(generate_chat(1500))
+    if request.param == 'shuffled':
+        # not in timestamp order: rows() goes through the argsort instead of the per-user positions
+        df = df.take(np.random.default_rng(0).permutation(len(df))).reset_index(drop=True)
+    return df
+
+
+def brute_force(df, start=None, end=None, users=None):
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= df['timestamp'] >= pd.Timestamp(start)
+    if end is not None:
+        keep &= df['timestamp'] < pd.Timestamp(end)
+    if users is not None:
+        keep &= df['user'].isin(list(users))
+    return df[keep]
+
+
+def windows(df):
+    timestamps = df['timestamp'].sort_values()
+    first, middle, last = timestamps.iloc[0], timestamps.iloc[len(df) // 2], timestamps.iloc[-1]
+    user = df['user'].value_counts().index[0]
+    return [
+        (first, last, None),  # end is exclusive: the last message(s) are left out
+        (first, last + pd.Timedelta(minutes=1), None),
+        (middle, None, None),  # start is inclusive
+        (None, middle, [user]),
+        (middle - pd.Timedelta(days=3), middle + pd.Timedelta(days=3), [user, 'group_notification']),
+        (middle, middle, None),  # empty range
+        (last, first, None),  # start after end
+        (last + pd.Timedelta(days=1), None, None),  # after the chat
+        (None, None, ['Nobody']),  # a user without messages
+        (first, last, []),
+    ]
+
+
+def test_query_matches_brute_force(df):
+    index = chat_index.ChatIndex(df)
+    for start, end, users in windows(df):
+        expected = brute_force(df, start, end, users)
+        selected = index.query(start, end, users)
+        pd.testing.assert_frame_equal(selected.df, expected)
+        assert selected.count('Overall') == len(expected)
+        for user in selected.users:
+            assert selected.count(user) == (expected['user'] == user).sum()
+
+
+def test_query_is_memoised(df):
+    index = chat_index.ChatIndex(df, key='chat')
+    start = df['timestamp'].min()
+    selected = index.query(start, users=['b', 'a'])
+    assert index.query(start, users=['a', 'b']) is selected
+    assert selected.key != index.key and index.query() is index
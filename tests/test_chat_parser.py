@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+import chat_parser
+
+
+@pytest.mark.parametrize('meridiem', ['PM', 'pm', 'Pm', 'p.m.', 'p. m.', 'p m', 'P M', ' p m', ' PM'])
+def test_meridiem_spellings(meridiem):
+    separator = '' if meridiem.startswith(' ') else ' '
+    df = chat_parser.parse(f"12/05/23, 9:41{separator}{meridiem} - Alice: hi\n")
+    assert df['user'].tolist() == ['Alice'] and df['message'].tolist() == ['hi']
+    assert df['timestamp'].tolist() == [pd.Timestamp('2023-12-05 21:41')]
+
+
+@pytest.mark.parametrize('timestamps, dayfirst, expected', [
+    (['12/31/23, 10:15 PM'], None, '%m/%d/%y, %I:%M %p'),
+    (['31/12/2023, 22:15'], None, '%d/%m/%Y, %H:%M'),
+    (['31/12/23, 22:15:07'], None, '%d/%m/%y, %H:%M:%S'),
+    (['12/31/23, 10:15\u202fPM'], None, '%m/%d/%y, %I:%M\u202f%p'),
+    (['12/31/23, 10:15PM'], None, '%m/%d/%y, %I:%M%p'),
+    # ambiguous: the chronological reading wins, month-first when both are
+    (['02/01/23, 10:15', '01/02/23, 10:15'], None, '%d/%m/%y, %H:%M'),
+    (['01/02/23, 10:15', '02/02/23, 10:15'], None, '%m/%d/%y, %H:%M'),
+    (['05/05/23, 10:15'], None, '%m/%d/%y, %H:%M'),
+    (['05/05/23, 10:15'], True, '%d/%m/%y, %H:%M'),
+    ([], None, None),
+])
+def test_detect_format(timestamps, dayfirst, expected):
+    assert chat_parser.detect_format(timestamps, dayfirst=dayfirst) == expected
+
+
+@pytest.mark.parametrize('timestamps', [
+    ['31/12/23, 10:15', '12/31/23, 10:15'],  # both fields above 12
+    ['12/31/23, 10:15 PM', '12/31/23, 22:15'],  # 12h and 24h mixed
+    ['12/31/23, 10:15', '12/31/2023, 10:15'],  # 2 and 4 digit years
+    ['2023-12-31 10:15'],
+])
+def test_detect_format_rejects(timestamps):
+    with pytest.raises(chat_parser.TimestampFormatError):
+        chat_parser.detect_format(timestamps)
+
+
+def day_first_chat():
+    # the first 12 days of January read both ways; the 13th decides for day-first
+    return ''.join(f"{day:02d}/01/23, 10:{day:02d} - Alice: day {day}\n" for day in range(1, 29))
+
+
+@pytest.mark.parametrize('batch_size', [1, 5, 12, 100])
+def test_ambiguous_first_batches(batch_size):
+    df = chat_parser.parse(day_first_chat(), batch_size=batch_size)
+    assert df.attrs['date_format'] == '%d/%m/%y, %H:%M'
+    assert df['timestamp'].dt.month.eq(1).all() and df['day'].tolist() == list(range(1, 29))
+
+
+def test_parse_parallel_detects_past_ambiguous_batches(monkeypatch):
+    monkeypatch.setattr(chat_parser, 'MIN_PARALLEL_CHUNK', 64)
+    data = day_first_chat()
+    df = chat_parser.parse_parallel(data, workers=2, batch_size=5)
+    pd.testing.assert_frame_equal(df, chat_parser.parse(data, batch_size=5))
+
+
+@pytest.mark.parametrize('dates, settled', [
+    (['03/05/23', '04/05/23', '05/05/23', '10/05/23'], False),  # 3-10 May and 5 Mar-5 Oct are both in order
+    (['05/04/23', '04/05/23'], True),  # only 5 Apr, 4 May is
+    (['03/05/23', '15/05/23'], True),
+])
+def test_date_settled(dates, settled):
+    df = chat_parser.parse(''.join(f"{date}, 10:00 - Alice: hi\n" for date in dates))
+    assert df.attrs['date_settled'] is settled
+
+
+@pytest.mark.parametrize('chunks', [['﻿12/05/23, 9:41 PM - Alice: hi\n'],
+                                    ['', '﻿12/05/23, 9:41 PM - Alice: hi\n'],
+                                    ['﻿12/05/23, 9:41 PM - Al', 'ice: hi\n']])
+def test_byte_order_mark_in_text(chunks):
+    # text read with encoding='utf-8' keeps the mark; it must not hide the first message
+    lines = list(chat_parser.iter_lines(iter(chunks)))
+    assert lines == ['12/05/23, 9:41 PM - Alice: hi\n']
+    df = chat_parser.parse(''.join(chunks))
+    assert df['user'].tolist() == ['Alice'] and df['message'].tolist() == ['hi']
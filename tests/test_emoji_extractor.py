@@ -0,0 +1,21 @@
+import pandas as pd
+
+import emoji_extractor
+import helper
+from benchmarks.synthetic import generate_chat
+
+
+def test_sequences_are_one_emoji_each():
+    messages = pd.Series(['no emoji here', 'a😀b 1️⃣ 5 #', '👨‍👩‍👧 x 👍🏽👍', 'café😀', '#⃣*️⃣12🇮🇳', '👍🏽👍'],
+                         index=[5, 3, 9, 1, 0, 7])
+    found = emoji_extractor.extract(messages)
+    assert found.index.tolist() == [3, 3, 9, 9, 9, 1, 0, 0, 0, 7, 7]
+    assert found.tolist() == ['😀', '1️⃣', '👨‍👩‍👧', '👍🏽', '👍', '😀', '#⃣', '*️⃣', '🇮🇳', '👍🏽', '👍']
+    assert emoji_extractor.extract(pd.Series(['plain text'])).empty
+
+
+def test_runs_match_the_trie_over_whole_messages():
+    messages = helper.preprocess(generate_chat(3000, emoji_rate=0.6))['message'].astype(str)
+    expected = messages.str.findall(emoji_extractor.emoji_pattern()).explode().dropna()
+    found = emoji_extractor.extract(messages)
+    assert found.index.tolist() == expected.index.tolist() and found.tolist() == expected.tolist()
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import chat_index
+import helper
+import incremental
+from benchmarks.synthetic import generate_chat
+
+USERS = ['Overall', 'Aarav', 'Esha']
+
+
+def assert_same_aggregates(index, full):
+    for user in USERS:
+        assert helper.calculate_stats(user, index) == helper.calculate_stats(user, full)
+        for function in (helper.daily_activity, helper.monthly_timeline, helper.weekly_activity_heatmap,
+                         helper.most_common_words, helper.emoji_counter):
+            pd.testing.assert_frame_equal(function(user, index), function(user, full))
+        pd.testing.assert_series_equal(helper.hourly_distribution(user, index), helper.hourly_distribution(user, full))
+
+
+@pytest.mark.parametrize('cut', ['message', 'continuation'])
+def test_new_appended_unchanged(tmp_path, cut):
+    text = generate_chat(2500, multiline_rate=0.2)
+    lines = text.splitlines(keepends=True)
+    # the first export ends on a whole message, or halfway through a two-line one; either way
+    # it reaches 14 January, so its month-first dates can't be read day-first
+    continuations = [i for i, line in enumerate(lines) if not line[0].isdigit()]
+    end = 1600 if cut == 'message' else next(i for i in continuations if i > 1600)
+    store = incremental.ChatStore(str(tmp_path))
+
+    first = store.ingest(''.join(lines[:end]))
+    assert first.status == 'new'
+    assert_same_aggregates(first.index(), chat_index.ChatIndex(helper.preprocess(''.join(lines[:end]), compact=True)))
+
+    full = chat_index.ChatIndex(helper.preprocess(text, compact=True))
+    appended = store.ingest(text)
+    assert appended.status == 'appended' and len(appended.df) == len(full.df)
+    assert_same_aggregates(appended.index(), full)
+
+    unchanged = store.ingest(text)
+    assert unchanged.status == 'unchanged'
+    assert_same_aggregates(unchanged.index(), full)
+
+
+def test_edited_history_is_parsed_again(tmp_path):
+    text = generate_chat(200)
+    store = incremental.ChatStore(str(tmp_path))
+    store.ingest(text)
+    edited = text.replace('Aarav:', 'Aarav K:', 1)
+    assert store.ingest(edited).status == 'new'
+
+
+def test_guessed_date_format_is_parsed_again(tmp_path):
+    # 3, 4, 5 and 10 May read chronologically month-first too (5 Mar, 5 Apr, 5 May, 5 Oct);
+    # the 15th shows the chat is day-first
+    first = ''.join(f"{day:02d}/05/23, 10:00 - Alice: day {day}\n" for day in (3, 4, 5, 10))
+    store = incremental.ChatStore(str(tmp_path))
+    assert store.ingest(first).df.attrs['date_format'] == '%m/%d/%y, %H:%M'
+
+    text = first + "15/05/23, 10:00 - Bob: day 15\n"
+    chat = store.ingest(text)
+    assert chat.status == 'new' and chat.df.attrs['date_format'] == '%d/%m/%y, %H:%M'
+    assert chat.df['day'].tolist() == [3, 4, 5, 10, 15] and (chat.df['timestamp'].dt.month == 5).all()
+    assert_same_aggregates(chat.index(), chat_index.ChatIndex(helper.preprocess(text, compact=True)))
+
+    # settled now: the next re-export is appended
+    assert store.ingest(text + "16/05/23, 10:00 - Alice: day 16\n").status == 'appended'
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import chat_parser
+from benchmarks.bench_preprocess import legacy_preprocess
+from benchmarks.synthetic import generate_chat
+
+COLUMNS = ['timestamp', 'user', 'message', 'year', 'day', 'hour', 'date']
+
+
+def test_parse_matches_legacy_preprocess():
+    chat = generate_chat(2000, multiline_rate=0.2)
+    df, legacy = chat_parser.parse(chat, batch_size=300), legacy_preprocess(chat)
+    pd.testing.assert_frame_equal(df[COLUMNS], legacy[COLUMNS], check_dtype=False)
+    assert df['month'].astype(str).tolist() == legacy['month'].tolist()
+    assert df['Day_name'].astype(str).tolist() == legacy['Day_name'].tolist()
+
+
+@pytest.mark.parametrize('workers', [2, 3, 7])
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_parse_parallel_matches_parse(monkeypatch, workers, as_bytes):
+    # small chunks, so many of them start right after a multi-line message or inside emoji bytes
+    monkeypatch.setattr(chat_parser, 'MIN_PARALLEL_CHUNK', 512)
+    chat = generate_chat(1500, multiline_rate=0.3, format='ios-24h')
+    data = ('\ufeff' + chat).encode('utf-8') if as_bytes else chat
+    expected = chat_parser.parse(data, batch_size=200)
+    df = chat_parser.parse_parallel(data, workers=workers, batch_size=200)
+    pd.testing.assert_frame_equal(df, expected)
+    assert df.attrs['date_format'] == expected.attrs['date_format']
+
+
+def test_split_chunks_start_on_messages():
+    chat = generate_chat(500, multiline_rate=0.5)
+    bounds = chat_parser.split_chunks(chat, 16)
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(chat)
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:]))
+    for start, _ in bounds[1:]:
+        assert chat[start - 1] == '\n' and chat_parser.MESSAGE_START.match(chat[start:start + 64])
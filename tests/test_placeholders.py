@@ -0,0 +1,18 @@
+import helper
+import tokenizer
+from benchmarks.synthetic import DELETED, MEDIA, generate_chat
+
+
+def test_ios_placeholders_count_as_media_not_words():
+    df = helper.preprocess(generate_chat(2000, format='ios-12h'))
+    _, _, media, _ = helper.calculate_stats('Overall', df)
+    assert media == (df['message'] == MEDIA['ios']).sum() > 0
+
+    tokens = set(tokenizer.corpus(df))
+    assert not tokens & {'omitted', '‎image', '‎this', 'deleted.'}
+
+
+def test_android_and_ios_placeholders_are_listed():
+    for platform in ('android', 'ios'):
+        assert MEDIA[platform] in tokenizer.MEDIA_PLACEHOLDERS
+        assert DELETED[platform] in tokenizer.PLACEHOLDERS
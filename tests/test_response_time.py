@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+import chat_parser
+import response_time
+
+
+def test_single_reply_reports_its_gap():
+    df = chat_parser.parse("12/05/23, 9:41 PM - Alice: hi\n"
+                           "12/05/23, 9:42 PM - Bob: hello\n")
+    by_user = response_time.analyze(df).by_user
+    assert by_user['User'].tolist() == ['Bob']
+    assert by_user[['Median (minutes)', 'P90 (minutes)', 'P99 (minutes)']].to_numpy().tolist() == [[1.0, 1.0, 1.0]]
+
+
+def test_grouped_quantiles_within_accuracy():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.exponential(10, 5000), np.zeros(100)])
+    codes = rng.integers(0, 3, len(values))
+    estimates = response_time.grouped_quantiles(codes, values, 3)
+    for group in range(3):
+        exact = np.quantile(values[codes == group], response_time.QUANTILES, method='lower')
+        np.testing.assert_allclose(estimates[group], exact, rtol=response_time.RELATIVE_ACCURACY)
+
+
+def test_grouped_quantiles_empty_group():
+    estimates = response_time.grouped_quantiles(np.array([0, 0, 0]), np.array([0.0, 2.0, 2.0]), 2)
+    assert estimates[0].tolist() == [2.0, 2.0, 2.0] and pd.isna(estimates[1]).all()
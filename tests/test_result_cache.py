@@ -0,0 +1,91 @@
+import pickle
+import sqlite3
+
+import pytest
+
+import result_cache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, 'time', clock)
+    return clock
+
+
+def value(i):
+    return bytes([i]) * 1000
+
+
+SIZE = len(pickle.dumps(value(0), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def stored(cache):
+    # looked up without get(), which would refresh the entries' access time
+    with sqlite3.connect(cache.path) as db:
+        return sorted(key for key, in db.execute('SELECT key FROM results'))
+
+
+def test_hits_and_misses_are_counted(tmp_path, clock):
+    cache = result_cache.ResultCache(str(tmp_path / 'results.sqlite'))
+    calls = []
+    for _ in range(3):
+        result = cache.get_or_compute('digest', 'stats', 'Alice', lambda: calls.append(1) or value(1), top=10)
+        assert result == value(1)
+    assert len(calls) == 1
+    assert cache.get(result_cache.make_key('digest', 'stats', 'Alice', top=20), None) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['bytes']) == (2, 2, 1, SIZE)
+    assert stats['hit_rate'] == 0.5
+
+    cache.reset_stats()
+    assert cache.stats()['hits'] == 0 and cache.stats()['hit_rate'] is None
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = result_cache.ResultCache(str(tmp_path / 'results.sqlite'), ttl=60)
+    cache.put('a', value(1))
+    clock.now += 30
+    cache.put('b', value(2))
+    clock.now += 30
+    assert cache.get('a') == value(1)  # exactly ttl old: still served
+    clock.now += 1
+    assert cache.get('a', None) is None
+    assert cache.get('b') == value(2)
+    assert cache.stats()['expired'] == 1
+
+    # the next write drops everything past its ttl, read or not
+    clock.now += 30
+    cache.put('c', value(3))
+    stats = cache.stats()
+    assert (stats['expired'], stats['entries']) == (2, 1)
+
+
+def test_least_recently_used_are_evicted(tmp_path, clock):
+    # room for four entries, the largest share a single entry may take
+    cache = result_cache.ResultCache(str(tmp_path / 'results.sqlite'), max_bytes=4 * SIZE + SIZE // 2)
+    for i, key in enumerate('abcd'):
+        clock.now += 1
+        assert cache.put(key, value(i))
+    clock.now += 1
+    cache.get('a')
+    clock.now += 1
+    cache.put('e', value(4))
+    assert stored(cache) == ['a', 'c', 'd', 'e']
+    clock.now += 1
+    cache.put('f', value(5))
+    assert stored(cache) == ['a', 'd', 'e', 'f']
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries'], stats['bytes']) == (2, 4, 4 * SIZE)
+
+    assert not cache.put('big', bytes(cache.max_bytes // 2))
+    assert cache.stats()['too_large'] == 1 and cache.get('big', None) is None
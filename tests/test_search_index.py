@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import chat_cache
+import chat_index
+import helper
+import search_index
+from benchmarks.synthetic import generate_chat
+
+
+@pytest.fixture(scope='module')
+def chat():
+    return chat_index.ChatIndex(helper.preprocess(generate_chat(1500)))
+
+
+@pytest.mark.parametrize('values', [[0], [1, 127, 128, 255, 16383, 16384], [2 ** 35, 0, 2 ** 50 + 3], []])
+def test_varint_round_trip(values):
+    values = np.array(values, dtype=np.int64)
+    encoded, sizes = search_index._varint_encode(values)
+    assert sizes.sum() == len(encoded) and (sizes[values < 128] == 1).all()
+    np.testing.assert_array_equal(search_index._varint_decode(encoded), values)
+
+
+def brute_force(chat, word):
+    tokens = search_index.normalize(chat.df['message'].reset_index(drop=True))
+    return np.unique(tokens.index[tokens.to_numpy() == word])
+
+
+def test_rows_match_brute_force(chat):
+    index = search_index.SearchIndex.build(chat.df)
+    for word in ['meeting', 'cricket', 'weekend', 'nothing-like-this']:
+        np.testing.assert_array_equal(index.rows(word), brute_force(chat, word))
+    prefix = np.unique(np.concatenate([brute_force(chat, word) for word in ('match', 'maybe', 'meeting', 'milte', 'movie')]))
+    np.testing.assert_array_equal(index.prefix_rows('m'), prefix)
+
+
+def test_save_load_round_trip(chat, tmp_path):
+    index = search_index.SearchIndex.build(chat.df)
+    index.save(tmp_path / 'index.npz')
+    loaded = search_index.SearchIndex.load(tmp_path / 'index.npz')
+    assert loaded.vocabulary.tolist() == index.vocabulary.tolist()
+    np.testing.assert_array_equal(loaded.offsets, index.offsets)
+    np.testing.assert_array_equal(loaded.postings, index.postings)
+    assert (loaded.num_rows, loaded.stopwords) == (index.num_rows, index.stopwords)
+    for query in ['meeting', 'proj*', '"code review"', 'lunch tomorrow']:
+        pd.testing.assert_frame_equal(search_index.search(chat, query, index=loaded),
+                                      search_index.search(chat, query, index=index))
+
+
+def test_for_chat_stores_the_index_next_to_the_frame(chat, tmp_path):
+    cache = chat_cache.ChatCache(str(tmp_path))
+    cache.put('key', chat.df)
+    built = search_index.for_chat(chat, cache, 'key')
+    assert (tmp_path / f'key.v{chat_cache.CACHE_VERSION}.{search_index.SUFFIX}').exists()
+    loaded = search_index.for_chat(chat_index.ChatIndex(chat.df), cache, 'key')
+    assert loaded is not built and loaded.vocabulary.tolist() == built.vocabulary.tolist()
+
+
+def test_phrase_needs_the_words_in_order(chat):
+    # stopwords between the words are skipped, as they are not indexed
+    found = search_index.search(chat, '"code review"')
+    assert len(found)
+    for message in found['message']:
+        tokens = search_index.normalize(pd.Series([message])).tolist()
+        assert ('code', 'review') in zip(tokens, tokens[1:])
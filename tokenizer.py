@@ -0,0 +1,71 @@
+import os
+import re
+import string
+from functools import lru_cache
+
+import pandas as pd
+
+import emoji_extractor
+import profiling
+
+STOPWORD_FILES = {
+    'hindi-english-telugu': 'stopwords_hindi-english-telugu.txt',
+    'hinglish': 'stop_hinglish.txt',
+}
+DEFAULT_STOPWORDS = 'hindi-english-telugu'
+
+# urls, long numbers / @mentions like @1234567890, html-ish tags and emails, removed in one pass
+CLEANUP = re.compile(r'http[s]?://\S+|[@]?\d{10,}|<.*?>|\S+@\S+\.\S+')
+
+MEDIA_OMITTED = '<Media omitted>'
+# iOS exports name the kind of media and put a left-to-right mark in front
+MEDIA_PLACEHOLDERS = [MEDIA_OMITTED] + [f'\u200e{kind} omitted' for kind in
+                                        ('image', 'video', 'audio', 'sticker', 'GIF', 'document', 'Contact card')]
+DELETED_PLACEHOLDERS = ['This message was deleted', 'You deleted this message',
+                        '\u200eThis message was deleted.', '\u200eYou deleted this message.']
+
+# messages that carry no words of their own
+PLACEHOLDERS = MEDIA_PLACEHOLDERS + DELETED_PLACEHOLDERS + ['null', '']
+
+
+@lru_cache(maxsize=None)
+def load_stopwords(name=DEFAULT_STOPWORDS):
+    # name is a key of STOPWORD_FILES or a path to a file with one word per line
+    path = STOPWORD_FILES.get(name, name)
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    with open(path, 'r', encoding='utf-8') as file:
+        return frozenset(line.strip().lower() for line in file if line.strip())
+
+
+def tokenize(messages, stopwords=DEFAULT_STOPWORDS):
+    # lower-cased tokens of a Series of messages, one row per token, indexed by the source row;
+    # punctuation-only tokens and stopwords are dropped
+    if isinstance(stopwords, str):
+        stopwords = load_stopwords(stopwords)
+    tokens = (messages.astype(str)
+              .str.replace(CLEANUP, '', regex=True)
+              .str.lower()
+              .str.split()
+              .explode()
+              .dropna())
+    tokens = tokens[tokens.str.strip(string.punctuation) != '']
+    return tokens[~tokens.isin(stopwords)]
+
+
+def corpus(df, stopwords=DEFAULT_STOPWORDS):
+    # tokens of every real message in df (no group notifications, media or deleted placeholders)
+    with profiling.stage('tokenize', rows=len(df)):
+        df = df[df['user'] != 'group_notification']
+        messages = df['message']
+        messages = messages[~messages.str.strip().isin(PLACEHOLDERS)]
+        return tokenize(messages, stopwords)
+
+
+def word_counts(df, stopwords=DEFAULT_STOPWORDS):
+    # occurrences per (user, word) for every user in one pass; emoji-only tokens are left to
+    # emoji_extractor.emoji_counts
+    words = corpus(df, stopwords)
+    words = words[~emoji_extractor.is_emoji_only(words)]
+    users = df['user'].astype(str).loc[words.index]
+    return pd.DataFrame({'user': users, 'word': words}).groupby(['user', 'word']).size()